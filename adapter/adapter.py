@@ -3,7 +3,6 @@ WindowsSov8 Anon Bot 自用 Adapter
 '''
 # -*- coding: utf-8 -*-
 # !/usr/bin/python3
-import json
 import time
 import requests
 from pydantic import BaseModel
@@ -11,7 +10,7 @@ from typing import Optional, Union, Literal, Any
 
 from . import event
 from .utils import Logging
-from .message import Message, MessageSegment
+from .message import Message, MessageSegment, SerializedMessage
 
 # 获取到的消息对象
 class MsgGet(BaseModel):
@@ -215,8 +214,7 @@ class Adapter(BaseModel):
             print_stat = f'设置请求发送成功，返回码：{response.status_code}'
         else:
             print_stat = f'设置请求发送错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
         
     # 好友信息 API
     
@@ -236,8 +234,7 @@ class Adapter(BaseModel):
             print_stat = f'陌生人信息获取成功，返回码：{response.status_code}'
         else:
             print_stat = f'陌生人信息获取失败，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
         data = response.json()['data']
         
         return StrangerInfo.model_validate(data)
@@ -249,7 +246,7 @@ class Adapter(BaseModel):
         self,
         message_type: Literal['private', 'group'],
         id_: int,
-        message: Union[str, Message, MessageSegment]
+        message: Union[str, Message, MessageSegment, SerializedMessage]
     ) -> int:
         '''发送消息
 
@@ -257,30 +254,32 @@ class Adapter(BaseModel):
         :type message_type: Literal['private', 'group']
         :param id_: 对方 QQ 号 ( 消息类型为 `private` 时需要 ) 或群号 ( 消息类型为 `group` 时需要 )
         :type user_id: int
-        :param message: 要发送的内容
-        :type message: Union[str, Message, MessageSegment]
+        :param message: 要发送的内容，已序列化的消息将被直接发送
+        :type message: Union[str, Message, MessageSegment, SerializedMessage]
         :return: 消息 ID
         :rtype: dict
         '''
         url = f'{self.http_url}:{self.port_send}/send_msg' # 消息发送URL
         
-        # 将 message 转换为 Message 对象
-        if isinstance(message, str):
-            message = MessageSegment.text(message)
-        if isinstance(message, MessageSegment):
-            message = Message(message)
+        # 将 message 转换为已序列化的消息
+        if not isinstance(message, SerializedMessage):
+            if isinstance(message, str):
+                message = MessageSegment.text(message)
+            if isinstance(message, MessageSegment):
+                message = Message(message)
+            message = message.serialize()
             
         if message_type == 'group': # 发送的为群聊消息
             data = {
                 'message_type': message_type,
                 'group_id': id_,
-                'message': json.dumps(message.__list__)
+                'message': message.payload
             }
         elif message_type == 'private': # 发送的为私聊消息
             data = {
                 'message_type': message_type,
                 'user_id': id_,
-                'message': json.dumps(message.__list__)
+                'message': message.payload
             }
         else:
             raise TypeError(f'不合法的消息类型：{message_type}')
@@ -290,8 +289,14 @@ class Adapter(BaseModel):
             print_stat = f'消息发送成功，返回码：{response.status_code}'
         else:
             print_stat = f'消息发送错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(
+            print_stat,
+            category='api',
+            echo=True,
+            group_id=data.get('group_id'),
+            user_id=data.get('user_id'),
+            latency=response.elapsed.total_seconds()
+        )
         
         return response.json()['data']['message_id']
         
@@ -311,11 +316,10 @@ class Adapter(BaseModel):
             print_stat = f'消息获取成功，返回码：{response.status_code}'
         else:
             print_stat = f'消息获取成功，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
         data = response.json()['data']
         message = MsgGet.model_validate(data)
-        Logging.info(str(message))
+        Logging.info(message, category='api')
         
         return message
 
@@ -333,8 +337,7 @@ class Adapter(BaseModel):
             print_stat = f'消息撤回成功，返回码：{response.status_code}'
         else:
             print_stat = f'消息撤回失败，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
         
         return
     
@@ -369,14 +372,20 @@ class Adapter(BaseModel):
             data['user_id'] = id_
             url = f'{self.http_url}:{self.port_send}/send_private_forward_msg' # 消息发送URL
         
-        data['messages'] = json.dumps(messages)
+        data['messages'] = messages.serialize().payload
         response = requests.post(url, data=data) # 获取返回值
         if response.status_code == 200: # 消息发送成功
             print_stat = f'消息发送成功，返回码：{response.status_code}'
         else:
             print_stat = f'消息发送错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(
+            print_stat,
+            category='api',
+            echo=True,
+            group_id=data.get('group_id'),
+            user_id=data.get('user_id'),
+            latency=response.elapsed.total_seconds()
+        )
         data = response.json()['data']
         
         return data['message_id'], data['forward_id']
@@ -400,8 +409,7 @@ class Adapter(BaseModel):
             print_stat = f'请求处理成功，返回码：{response.status_code}'
         else:
             print_stat = f'请求处理错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
 
     # 处理加群请求 / 邀请
     def set_group_add_request(
@@ -432,8 +440,7 @@ class Adapter(BaseModel):
             print_stat = f'请求处理成功，返回码：{response.status_code}'
         else:
             print_stat = f'请求处理错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
 
     # 群信息 API
     
@@ -459,8 +466,7 @@ class Adapter(BaseModel):
             print_stat = f'群成员{user_id}信息获取成功，返回码：{response.status_code}'
         else:
             print_stat = f'群成员{user_id}信息获取错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
         
         return GroupMemberInfo.model_validate(response.json()['data'])
 
@@ -482,8 +488,7 @@ class Adapter(BaseModel):
             print_stat = f'群{group_id}设置群名为{group_name}请求发送成功，返回码：{response.status_code}'
         else:
             print_stat = f'群{group_id}设置群名为{group_name}请求发送错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
 
     # 设置群名片（群备注）
     def set_group_card(
@@ -508,8 +513,7 @@ class Adapter(BaseModel):
             print_stat = f'{user_id}群名片设置为{card}请求发送成功，返回码：{response.status_code}'
         else:
             print_stat = f'{user_id}群名片设置为{card}请求发送错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
 
     # 群操作 API
     
@@ -536,8 +540,7 @@ class Adapter(BaseModel):
             print_stat = f'禁言{user_id}请求发送成功，返回码：{response.status_code}'
         else:
             print_stat = f'禁言{user_id}请求发送错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
 
     # 群组踢人
     def set_group_kick(
@@ -562,8 +565,7 @@ class Adapter(BaseModel):
             print_stat = f'将 {user_id} 踢出 {group_id} 请求发送成功，返回码：{response.status_code}'
         else:
             print_stat = f'将 {user_id} 踢出 {group_id} 请求发送错误，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
 
     # 文件 API
     
@@ -607,5 +609,4 @@ class Adapter(BaseModel):
             print_stat = f'文件上传成功，返回码：{response.status_code}'
         else:
             print_stat = f'文件上传成功，返回码：{response.status_code}'
-        print(print_stat)
-        Logging.info(print_stat)
+        Logging.info(print_stat, category='api', echo=True, latency=response.elapsed.total_seconds())
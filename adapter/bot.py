@@ -4,15 +4,160 @@ WindowsSov8 Anon Bot 自用 Adapter
 # -*- coding: utf-8 -*-
 # !/usr/bin/python3
 import os
+import time
+import atexit
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Mapping
 from typing import Optional, Literal, Union, Any
 
 from .adapter import Adapter
 from .utils import MyJson, Logging
-from .message import Message, MessageSegment
-from .event import Event, MessageEvent, PokeEvent
+from .store import StateStore
+from .message import Message, MessageSegment, SerializedMessage
+from .event import Event, MessageEvent, PokeEvent, HeartbeatEvent
 
 # 获取当前文件所在父目录
 CURRENT_DIR = os.path.dirname(os.path.dirname(__file__))
+# Bot 信息文件路径
+BOT_INFO_PATH = CURRENT_DIR + '/resources/bot_info.json'
+
+# 获取文件修改时间
+def _get_mtime_ns(file_name: str) -> Optional[int]:
+    '''获取文件修改时间，文件不存在时返回 `None`
+
+    :param file_name: 文件路径
+    :type file_name: str
+    :return: 以纳秒计的文件修改时间
+    :rtype: Optional[int]
+    '''
+    try:
+        return os.stat(file_name).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+# 空黑名单
+_EMPTY_BLOCK_LIST: frozenset[str] = frozenset()
+
+# Bot 信息缓存基类
+class _BotInfoCache(ABC):
+    '''Bot 信息缓存基类，将 Bot 信息常驻内存。
+
+    未指定状态存储时使用 Bot 信息文件，修改后延迟写入文件；
+    指定状态存储时修改将立即写入存储。
+    '''
+    reload_interval: float = 5.0
+    '''检查是否被外部修改的最小间隔秒数'''
+    save_delay: float = 1.0
+    '''修改后延迟写入文件的秒数，期间的多次修改将合并写入'''
+    retry_delay: float = 10.0
+    '''写入失败后重试的间隔秒数'''
+    # 创建一个 Bot 信息缓存
+    def __init__(self, store: Optional[StateStore]=None) -> None:
+        '''Bot 信息缓存基类
+
+        :param store: 状态存储，为 `None` 时使用 Bot 信息文件
+        :type store: Optional[StateStore], optional
+        '''
+        self.store = store
+        '''状态存储'''
+        self._version: Optional[int] = None
+        '''最后一次读写时的数据版本，使用文件时为文件修改时间'''
+        self._checked = 0.0
+        '''最后一次检查文件修改时间的时刻'''
+        self._dirty = False
+        '''是否有未写入的修改'''
+        self._timer: Optional[threading.Timer] = None
+        '''延迟写入计时器'''
+        self._lock = threading.RLock()
+        '''线程锁'''
+        self._load()
+        atexit.register(self.flush)
+    
+    # 从 Bot 信息中读取
+    @abstractmethod
+    def _from_info(self, bot_info: Mapping[str, Any]) -> None:
+        '''从 Bot 信息中读取，由子类实现
+
+        :param bot_info: Bot 信息
+        :type bot_info: Mapping[str, Any]
+        '''
+    
+    # 从状态存储中读取
+    @abstractmethod
+    def _from_store(self, store: StateStore) -> None:
+        '''从状态存储中读取，由子类实现
+
+        :param store: 状态存储
+        :type store: StateStore
+        '''
+    
+    # 获取数据版本
+    def _get_version(self) -> Optional[int]:
+        '''获取数据版本，使用文件时为文件修改时间'''
+        if self.store is not None:
+            return self.store.data_version()
+        return _get_mtime_ns(BOT_INFO_PATH)
+    
+    # 保存修改
+    @abstractmethod
+    def _save(self) -> None:
+        '''将内存中的修改写入文件，由子类实现'''
+        
+    # 加载
+    def _load(self) -> None:
+        '''从文件或状态存储加载'''
+        with self._lock:
+            # 先记录数据版本，加载期间的外部修改将在下次检查时重新加载
+            self._version = self._get_version()
+            if self.store is not None:
+                self._from_store(self.store)
+            else:
+                self._from_info(MyJson.read_to_dict(BOT_INFO_PATH, readonly=True))
+            self._checked = time.monotonic()
+    
+    # 检查是否被外部修改
+    def _refresh(self) -> None:
+        '''检查是否被外部修改，若是则重新加载，检查间隔不小于 `reload_interval`'''
+        if time.monotonic() - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            self._checked = time.monotonic()
+            if self._dirty: # 有未写入的修改时以内存为准
+                return
+            if self._get_version() != self._version:
+                self._load()
+    
+    # 计划延迟写入
+    def _schedule_save(self, delay: Optional[float]=None) -> None:
+        '''计划延迟写入，调用时需持有锁
+
+        :param delay: 延迟秒数，为 `None` 时为 `save_delay`
+        :type delay: Optional[float], optional
+        '''
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay if delay is None else delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    # 写入未保存的修改
+    def flush(self) -> None:
+        '''立即写入未保存的修改'''
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                self._save()
+            except Exception as exception:
+                Logging.error(exception)
+                self._schedule_save(self.retry_delay) # 修改仍保留在内存中，稍后重试
+                return
+            self._dirty = False
+            self._version = self._get_version()
 
 # 检查消息中存在的回复
 def _check_reply(event: MessageEvent) -> int:
@@ -23,12 +168,9 @@ def _check_reply(event: MessageEvent) -> int:
     :param event: MessageEvent 对象
     :type event: MessageEvent
     '''
-    try:
-        index = [x.type == 'reply' for x in event.message].index(True)
-    except ValueError:
+    if (msg_seg := event.message.first('reply')) is None:
         return -1
     
-    msg_seg = event.message[index]
     message_id = int(msg_seg.data['id'])
     return message_id
 
@@ -49,17 +191,21 @@ def _check_at_me(bot: 'Bot', event: MessageEvent) -> bool:
     if event.message_type == 'private':
         return True
     else:
-        for segment in event.message:
-            if segment.type == 'at' and segment.data.get('qq', '') == str(event.self_id):
-                return True
-            
-    return False
+        return event.message.mentions(event.self_id)
 
 # Bot 基类
 class Bot:
     '''Bot 基类'''
     # 创建一个 Bot 基类
-    def __init__(self, self_id: int, host_id: int, adapter: Adapter) -> None:
+    def __init__(
+        self,
+        self_id: int,
+        host_id: int,
+        adapter: Adapter,
+        nickname: str='Bot',
+        page_length: int=500,
+        store: Optional[StateStore]=None
+    ) -> None:
         '''Bot 基类
 
         :param self_id: 机器人 ID
@@ -68,16 +214,28 @@ class Bot:
         :type host_id: int
         :param adapter: 适配器对象
         :type adapter: Adapter
+        :param nickname: 机器人名称，用于分页发送时的合并转发消息节点
+        :type nickname: str, optional
+        :param page_length: 分页发送时每页的最大长度
+        :type page_length: int, optional
+        :param store: 管理员与黑名单的状态存储，为 `None` 时使用 `resources/bot_info.json`
+        :type store: Optional[StateStore], optional
         '''
+        if page_length < 1:
+            raise ValueError(f'不合法的每页最大长度：{page_length}')
         self.adapter = adapter
         '''适配器对象'''
         self.self_id = self_id
         '''机器人 ID'''
         self.host_id = host_id
         '''主人 ID'''
-        self.admin = self.Admin(host_id)
+        self.nickname = nickname
+        '''机器人名称'''
+        self.page_length = page_length
+        '''分页发送时每页的最大长度'''
+        self.admin = self.Admin(host_id, store)
         '''管理员操作方法'''
-        self.block_list = self.BlockList()
+        self.block_list = self.BlockList(store)
         '''黑名单操作方法'''
     
     # POST 数据转换为事件对象
@@ -95,12 +253,21 @@ class Bot:
             
             # 记录事件
             if isinstance(event, MessageEvent): # 如果是消息事件
-                print(event)
-                Logging.info(str(event))
+                Logging.info(
+                    event,
+                    category='message',
+                    echo=True,
+                    group_id=getattr(event, 'group_id', None),
+                    user_id=event.user_id,
+                    message_id=event.message_id
+                )
             elif isinstance(event, PokeEvent): # 如果是戳一戳事件
                 print_poke = f'(来自群组{event.group_id}){event.user_id} -戳一戳-> {event.target_id}'
-                print(print_poke)
-                Logging.info(print_poke)
+                Logging.info(
+                    print_poke, category='poke', echo=True, group_id=event.group_id, user_id=event.user_id
+                )
+            elif isinstance(event, HeartbeatEvent): # 如果是心跳包
+                Logging.debug(f'收到心跳包，间隔 {event.interval} 毫秒', category='heartbeat')
                 
             return event
         except Exception as exception:
@@ -110,18 +277,19 @@ class Bot:
     def send(
         self,
         event: Event,
-        message: Union[str, Message, MessageSegment],
+        message: Union[str, Message, MessageSegment, SerializedMessage],
         at_sender: bool=False,
         reply_message: bool=False,
         message_type: Optional[Literal['private', 'group']]=None,
-        target_id: Optional[int]=None
+        target_id: Optional[int]=None,
+        paginate: bool=False
     ) -> int:
         '''默认回复消息处理函数
 
         :param event: `adapter.event.Event` 事件对象
         :type event: Event
         :param message: 消息段
-        :type message: Union[str, Message, MessageSegment]
+        :type message: Union[str, Message, MessageSegment, SerializedMessage]
         :param at_sender: 是否 @ 事件主体
         :type at_sender: bool, optional
         :param reply_message: 是否回复事件
@@ -130,6 +298,8 @@ class Bot:
         :type message_type: Optional[Literal[&#39;private&#39;, &#39;group&#39;]], optional
         :param target_id: 指定消息发送目标
         :type target_id: Optional[int], optional
+        :param paginate: 消息超过 `page_length` 时是否分页并以合并转发消息发送
+        :type paginate: bool, optional
         :raises ValueError: 不合法的目标 ID
         :raises ValueError: 不合法的消息 ID
         :raises TypeError: 无法指定消息发送对象
@@ -139,6 +309,8 @@ class Bot:
         :rtype: int
         '''
         # 预处理消息
+        if isinstance(message, SerializedMessage) and (at_sender or reply_message):
+            message = message.to_message() # 需要前置消息段时反序列化
         if at_sender: # @ 事件主体为前置 @
             at_id = getattr(event, 'user_id', target_id)
             if not isinstance(at_id, int):
@@ -161,10 +333,11 @@ class Bot:
                 (group_id := getattr(event, 'group_id')) is not None
             ):
                 # 如果有 group_id 字段且字段值不为 None
-                message_id = self.adapter.send_msg(
+                message_id = self._send_msg(
                     'group',
                     group_id,
-                    message
+                    message,
+                    paginate
                 )
                 return message_id
             else: # 是私聊消息
@@ -173,20 +346,22 @@ class Bot:
                     (user_id := getattr(event, 'user_id')) is not None
                 ):
                     # 如果有 user_id 字段且字段值不为 None
-                    message_id = self.adapter.send_msg(
+                    message_id = self._send_msg(
                         'private',
                         user_id,
-                        message
+                        message,
+                        paginate
                     )
                     return message_id
                 else:
                     raise TypeError('无法指定消息发送对象')
         else: # 指定了消息类型
             if target_id is not None: # 指定了目标 ID
-                message_id = self.adapter.send_msg(
+                message_id = self._send_msg(
                     message_type,
                     target_id,
-                    message
+                    message,
+                    paginate
                 )
                 return message_id
             else: # 没有指定目标 ID
@@ -196,10 +371,11 @@ class Bot:
                         (group_id := getattr(event, 'group_id')) is not None
                     ):
                         # 如果有 group_id 字段且字段值不为 None
-                        message_id = self.adapter.send_msg(
+                        message_id = self._send_msg(
                             'group',
                             group_id,
-                            message
+                            message,
+                            paginate
                         )
                         return message_id
                     else:
@@ -210,45 +386,89 @@ class Bot:
                         (user_id := getattr(event, 'user_id')) is not None
                     ):
                         # 如果有 user_id 字段且字段值不为 None
-                        message_id = self.adapter.send_msg(
+                        message_id = self._send_msg(
                             'private',
                             user_id,
-                            message
+                            message,
+                            paginate
                         )
                         return message_id
                     else:
                         raise TypeError('错误的消息类型指定')
     
+    # 发送消息
+    def _send_msg(
+        self,
+        message_type: Literal['private', 'group'],
+        id_: int,
+        message: Union[str, Message, MessageSegment, SerializedMessage],
+        paginate: bool=False
+    ) -> int:
+        '''发送消息，需要分页时以合并转发消息发送
+
+        :param message_type: 消息类型
+        :type message_type: Literal[&#39;private&#39;, &#39;group&#39;]
+        :param id_: 对方 QQ 号或群号
+        :type id_: int
+        :param message: 要发送的内容
+        :type message: Union[str, Message, MessageSegment, SerializedMessage]
+        :param paginate: 是否分页
+        :type paginate: bool, optional
+        :return: 消息 ID
+        :rtype: int
+        '''
+        if paginate and not isinstance(message, SerializedMessage):
+            if isinstance(message, str):
+                message = MessageSegment.text(message)
+            if isinstance(message, MessageSegment):
+                message = Message(message)
+            if len(pages := message.paginate(self.page_length)) > 1:
+                forward = Message([
+                    MessageSegment.node_custom(self.nickname, self.self_id, page) for page in pages
+                ])
+                message_id, _ = self.adapter.send_forward_msg(message_type, id_, forward)
+                return message_id
+        return self.adapter.send_msg(message_type, id_, message)
+    
     # 管理员操作类
-    class Admin:
-        '''管理员操作类'''
+    class Admin(_BotInfoCache):
+        '''管理员操作类，管理员列表常驻内存'''
         # 创建一个管理员操作类
-        def __init__(self, host_id: int) -> None:
+        def __init__(self, host_id: int, store: Optional[StateStore]=None) -> None:
             '''管理员操作类
 
             :param host_id: 主人 ID
             :type host_id: int
+            :param store: 状态存储，为 `None` 时使用 Bot 信息文件
+            :type store: Optional[StateStore], optional
             '''
             self.host_id = host_id
-            '''适配器对象'''
+            '''主人 ID'''
+            self.admin_set: set[int] = set()
+            '''管理员集合'''
+            super().__init__(store)
+        
+        # 从 Bot 信息中读取
+        def _from_info(self, bot_info: Mapping[str, Any]) -> None:
+            self.admin_set = set(bot_info.get('admin_list', []))
+        
+        # 从状态存储中读取
+        def _from_store(self, store: StateStore) -> None:
+            self.admin_set = set(store.admin_list())
+        
+        # 保存修改
+        def _save(self) -> None:
+            self.admin_list_save(sorted(self.admin_set))
             
         # 获取管理员列表
-        @classmethod
-        def get_list(cls) -> list[int]:
+        def get_list(self) -> list[int]:
             '''获取管理员列表
 
             :return: 管理员 ID 列表
             :rtype: list[int]
             '''
-            # 获取 Bot 信息
-            bot_info = MyJson.read_to_dict(CURRENT_DIR + '/resources/bot_info.json')
-            # 检测并获取管理员列表
-            if bot_info.get('admin_list') is None: # 管理员列表未被记录
-                bot_info['admin_list'] = []
-                MyJson.write(CURRENT_DIR + '/resources/bot_info.json', bot_info)
-                return []
-            else:
-                return bot_info['admin_list']
+            self._refresh()
+            return sorted(self.admin_set)
             
         # 保存管理员列表
         @staticmethod
@@ -258,12 +478,11 @@ class Bot:
             :param admin_list: 将要保存的管理员列表
             :type admin_list: list
             '''
-            # 获取 bot 信息
-            bot_info = MyJson.read_to_dict(CURRENT_DIR + '/resources/bot_info.json')
             # 保存列表
-            bot_info['admin_list'] = admin_list
+            def update(bot_info: dict[str, Any]) -> None:
+                bot_info['admin_list'] = admin_list
             try:
-                MyJson.write(CURRENT_DIR + '/resources/bot_info.json', bot_info)
+                MyJson.update(BOT_INFO_PATH, update)
             except Exception as exception:
                 print(f'保存管理员列表时出现错误：{exception}')
                 raise exception
@@ -281,10 +500,9 @@ class Bot:
             if user_id ==  self.host_id:
                 return True
             
-            # 获取管理员列表
-            admin_list = self.get_list()
-            #判断是否在列表里面
-            return user_id in admin_list
+            #判断是否在集合里面
+            self._refresh()
+            return user_id in self.admin_set
         
         # 添加管理员
         def add(self, user_id: int) -> Literal['Already Admin', 'Add Successfully']:
@@ -292,22 +510,22 @@ class Bot:
 
             :param user_id: 要添加的 ID
             :type user_id: int
-            :raises exception: 添加状况
-            :return: _description_
+            :return: 添加状况
             :rtype: str
             '''
-            # 判断是否已是管理员
-            if self.is_admin(user_id):
-                return 'Already Admin'
-            else:
+            with self._lock:
+                # 判断是否已是管理员
+                if self.is_admin(user_id):
+                    return 'Already Admin'
                 # 添加管理员并保存
-                admin_list = self.get_list()
-                admin_list.append(user_id)
-                try:
-                    self.admin_list_save(admin_list)
-                    return 'Add Successfully'
-                except Exception as exception:
-                    raise exception
+                if self.store is not None:
+                    if not self.store.add_admin(user_id): # 已被其他进程添加
+                        self.admin_set.add(user_id)
+                        return 'Already Admin'
+                else:
+                    self._schedule_save()
+                self.admin_set.add(user_id)
+                return 'Add Successfully'
                 
         # 移除管理员
         def remove(self, user_id: int) -> Literal['Not Admin', 'Remove Successfully']:
@@ -318,71 +536,95 @@ class Bot:
             :return: 移除状况
             :rtype: str
             '''
-            # 判断是否已是管理员
-            if not self.is_admin(user_id):
-                return 'Not Admin'
-            else:
+            self._refresh()
+            with self._lock:
+                # 判断是否已是管理员
+                if not user_id in self.admin_set:
+                    return 'Not Admin'
                 # 删除管理员并保存
-                admin_list = self.get_list()
-                admin_list.remove(user_id)
-                try:
-                    self.admin_list_save(admin_list)
-                    return 'Remove Successfully'
-                except Exception as exception:
-                    raise exception
+                if self.store is not None:
+                    if not self.store.remove_admin(user_id): # 已被其他进程移除
+                        self.admin_set.discard(user_id)
+                        return 'Not Admin'
+                else:
+                    self._schedule_save()
+                self.admin_set.remove(user_id)
+                return 'Remove Successfully'
 
     # 黑名单操作类
-    class BlockList:
-        '''黑名单操作类'''
+    class BlockList(_BotInfoCache):
+        '''黑名单操作类，各群黑名单以不可变集合常驻内存'''
+        # 创建一个黑名单操作类
+        def __init__(self, store: Optional[StateStore]=None) -> None:
+            '''黑名单操作类
+
+            :param store: 状态存储，为 `None` 时使用 Bot 信息文件
+            :type store: Optional[StateStore], optional
+            '''
+            self.block_dict: dict[str, frozenset[str]] = {}
+            '''各群黑名单：群号 -> 被屏蔽的插件或功能集合'''
+            self._dirty_groups: set[str] = set()
+            '''有未写入修改的群号'''
+            super().__init__(store)
+        
+        # 从 Bot 信息中读取
+        def _from_info(self, bot_info: Mapping[str, Any]) -> None:
+            self.block_dict = {
+                group_id: frozenset(block_list)
+                for group_id, block_list in bot_info.get('group_block_list', {}).items()
+                if block_list
+            }
+        
+        # 从状态存储中读取
+        def _from_store(self, store: StateStore) -> None:
+            self.block_dict = store.block_dict()
+        
+        # 保存修改
+        def _save(self) -> None:
+            # 只更新有修改的群
+            def update(bot_info: dict[str, Any]) -> None:
+                group_block_list = bot_info.setdefault('group_block_list', {})
+                for group_id in self._dirty_groups:
+                    group_block_list[group_id] = sorted(self.block_dict.get(group_id, ()))
+            try:
+                MyJson.update(BOT_INFO_PATH, update)
+            except Exception as exception:
+                print(f'保存黑名单列表时出现错误：{exception}')
+                raise exception
+            self._dirty_groups.clear()
+        
         # 获取黑名单
-        @staticmethod
-        def get_list(group_id: int) -> list[str]:
+        def get_list(self, group_id: int) -> frozenset[str]:
             '''获取黑名单
 
             :param group_id: 群号
             :type group_id: int
-            :return: 黑名单列表
-            :rtype: list[str]
+            :return: 黑名单集合
+            :rtype: frozenset[str]
             '''
-            # 获取 Bot 信息
-            bot_info = MyJson.read_to_dict(CURRENT_DIR + '/resources/bot_info.json')
-            # 检测并获取黑名单列表
-            if bot_info.get('group_block_list') is None: # 没有黑名单被记录
-                bot_info['group_block_list'] = {}
-                bot_info['group_block_list'][str(group_id)] = []
-                MyJson.write(CURRENT_DIR + '/resources/bot_info.json', bot_info)
-                return []
-            else:
-                if bot_info['group_block_list'].get(str(group_id)) is None: # 该群没有黑名单被记录
-                    bot_info['group_block_list'][str(group_id)] = []
-                    MyJson.write(CURRENT_DIR + '/resources/bot_info.json', bot_info)
-                    return []
-                else:
-                    return bot_info['group_block_list'][str(group_id)]
+            self._refresh()
+            return self.block_dict.get(str(group_id), _EMPTY_BLOCK_LIST)
             
         # 保存黑名单列表
-        @staticmethod
-        def block_list_save(block_list: list[str], group_id: int) -> None:
-            '''_summary_
+        def block_list_save(self, block_list: Iterable[str], group_id: int) -> None:
+            '''保存黑名单列表
 
             :param block_list: 将要保存的黑名单列表
-            :type block_list: list[str]
+            :type block_list: Iterable[str]
             :param group_id: 将要保存的群号
             :type group_id: int
             '''
-            # 获取 bot 信息
-            bot_info = MyJson.read_to_dict(CURRENT_DIR + '/resources/bot_info.json')
-            # 保存列表
-            bot_info['group_block_list'][str(group_id)] = block_list
-            try:
-                MyJson.write(CURRENT_DIR + '/resources/bot_info.json', bot_info)
-            except Exception as exception:
-                print(f'保存管理员列表时出现错误：{exception}')
-                raise exception
+            block_list = frozenset(block_list)
+            with self._lock:
+                if self.store is not None:
+                    self.store.set_block_list(group_id, block_list)
+                else:
+                    self._dirty_groups.add(str(group_id))
+                    self._schedule_save()
+                self.block_dict[str(group_id)] = block_list
             
         # 检测是否被屏蔽
-        @classmethod
-        def is_blocked(cls, group_id: int, plugin_name: str) -> bool:
+        def is_blocked(self, group_id: int, plugin_name: str) -> bool:
             '''检测是否被屏蔽
 
             :param group_id: 要检测的群号
@@ -392,15 +634,12 @@ class Bot:
             :return: 是否被屏蔽
             :rtype: bool
             '''
-            # 获取黑名单列表
-            block_list = cls.get_list(group_id)
-            #判断是否在列表里面
-            return plugin_name in block_list
+            #判断是否在黑名单里面
+            return plugin_name in self.get_list(group_id)
         
         # 屏蔽插件
-        @classmethod
         def block(
-            cls,
+            self,
             group_id: int,
             plugin_name: str
         ) -> Literal['Already Blocked', 'Block Successfully']:
@@ -413,23 +652,22 @@ class Bot:
             :return: 处理结果
             :rtype: str
             '''
-            # 判断是否已被屏蔽
-            if cls.is_blocked(group_id, plugin_name):
-                return 'Already Blocked'
-            else:
+            with self._lock:
+                # 判断是否已被屏蔽
+                if self.is_blocked(group_id, plugin_name):
+                    return 'Already Blocked'
                 # 加入黑名单并保存
-                block_list = cls.get_list(group_id)
-                block_list.append(plugin_name)
-                try:
-                    cls.block_list_save(block_list, group_id)
+                block_list = self.get_list(group_id) | {plugin_name}
+                if self.store is None:
+                    self.block_list_save(block_list, group_id)
                     return 'Block Successfully'
-                except Exception as exception:
-                    raise exception
+                changed = self.store.block(group_id, plugin_name)
+                self.block_dict[str(group_id)] = block_list
+                return 'Block Successfully' if changed else 'Already Blocked' # 已被其他进程屏蔽
                 
         # 取消屏蔽插件
-        @classmethod
         def allow(
-            cls,
+            self,
             group_id: int,
             plugin_name: str
         ) -> Literal['Not Blocked', 'Allow Successfully']:
@@ -442,15 +680,15 @@ class Bot:
             :return: 处理结果
             :rtype: str
             '''
-            # 判断是否已被屏蔽
-            if not cls.is_blocked(group_id, plugin_name):
-                return 'Not Blocked'
-            else:
+            with self._lock:
+                # 判断是否已被屏蔽
+                if not self.is_blocked(group_id, plugin_name):
+                    return 'Not Blocked'
                 # 移出黑名单并保存
-                block_list = cls.get_list(group_id)
-                block_list.remove(plugin_name)
-                try:
-                    cls.block_list_save(block_list, group_id)
+                block_list = self.get_list(group_id) - {plugin_name}
+                if self.store is None:
+                    self.block_list_save(block_list, group_id)
                     return 'Allow Successfully'
-                except Exception as exception:
-                    raise exception
+                changed = self.store.allow(group_id, plugin_name)
+                self.block_dict[str(group_id)] = block_list
+                return 'Allow Successfully' if changed else 'Not Blocked' # 已被其他进程取消屏蔽
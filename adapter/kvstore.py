@@ -0,0 +1,387 @@
+'''插件键值存储。
+WindowsSov8 Anon Bot 自用 Adapter
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import json
+import atexit
+import threading
+from copy import deepcopy
+from typing import Optional, Union, Any, TextIO
+from collections.abc import Mapping
+
+from .utils import MyJson, Logging, atomic_write
+
+# 获取当前文件所在父目录
+CURRENT_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# 键值日志类
+class _Journal:
+    '''键值日志类，每个命名空间对应一个日志文件。
+
+    日志文件每行为一条 json 记录：`[键, 值]` 表示写入，`[键]` 表示删除。
+    读取全部由内存索引完成，写入只在文件末尾追加一行。
+    '''
+    def __init__(self, file_name: str) -> None:
+        '''键值日志类
+
+        :param file_name: 日志文件路径
+        :type file_name: str
+        '''
+        self.file_name = file_name
+        '''日志文件路径'''
+        self.index: dict[str, Any] = {}
+        '''内存索引'''
+        self.records = 0
+        '''日志文件中的记录数'''
+        self.lock = threading.Lock()
+        '''日志锁'''
+        self.file: Optional[TextIO] = None
+        '''追加写入的文件句柄'''
+        self._load()
+    
+    # 从日志文件加载索引
+    def _load(self) -> None:
+        '''从日志文件加载索引，文件末尾写了一半的记录将被截去'''
+        if not os.path.exists(self.file_name):
+            self.file = open(self.file_name, 'a', encoding='utf-8')
+            return None
+        
+        valid_size = 0
+        with open(self.file_name, 'rb') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                # 记录应为 [键] 或 [键, 值]
+                if not (isinstance(record, list) and len(record) in (1, 2) and isinstance(record[0], str)):
+                    if line.endswith(b'\n'): # 中间出现的损坏记录只跳过
+                        Logging.warn(f'跳过 {self.file_name} 中损坏的记录：{line!r}')
+                        valid_size += len(line)
+                        continue
+                    break # 末尾写了一半的记录
+                if not line.endswith(b'\n'): # 末尾缺少换行的记录视为未写完
+                    break
+                valid_size += len(line)
+                self.records += 1
+                if len(record) == 2:
+                    self.index[record[0]] = record[1]
+                else:
+                    self.index.pop(record[0], None)
+        
+        if valid_size < os.path.getsize(self.file_name):
+            Logging.warn(f'截去 {self.file_name} 末尾未写完的记录')
+            with open(self.file_name, 'r+b') as file:
+                file.truncate(valid_size)
+        self.file = open(self.file_name, 'a', encoding='utf-8')
+    
+    # 追加记录
+    def append(self, records: list[list[Any]]) -> None:
+        '''追加记录并更新内存索引，调用时需持有日志锁
+
+        :param records: 要追加的记录列表
+        :type records: list[list[Any]]
+        '''
+        self.file.write(''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for record in records
+        ))
+        self.file.flush()
+        if KVStore.fsync:
+            os.fsync(self.file.fileno())
+        self.records += len(records)
+        for record in records:
+            if len(record) == 2:
+                value = record[1]
+                self.index[record[0]] = deepcopy(value) if isinstance(value, (dict, list)) else value
+            else:
+                self.index.pop(record[0], None)
+        
+        # 失效记录过多时压缩
+        if self.records >= KVStore.compact_min_records and \
+            self.records > len(self.index) * KVStore.compact_ratio:
+            self.compact()
+    
+    # 压缩日志文件
+    def compact(self) -> None:
+        '''压缩日志文件，只保留每个键的最新值，调用时需持有日志锁'''
+        # 写入每个键的最新值
+        def write(file: TextIO) -> None:
+            for key, value in self.index.items():
+                file.write(json.dumps([key, value], ensure_ascii=False, separators=(',', ':')) + '\n')
+        
+        self.file.close() # 替换前关闭追加写入的文件句柄
+        try:
+            atomic_write(self.file_name, write)
+        finally:
+            self.file = open(self.file_name, 'a', encoding='utf-8')
+        self.records = len(self.index)
+    
+    # 关闭日志文件
+    def close(self) -> None:
+        '''关闭日志文件'''
+        with self.lock:
+            if self.file is not None and not self.file.closed:
+                self.file.close()
+
+# 插件键值存储类
+class KVStore:
+    '''插件键值存储类，用法与 `MyJson` 相似，以命名空间代替文件路径。
+
+    每次写入只在命名空间的日志文件末尾追加一行，而不是重写整个 json 文件，
+    读取由内存索引完成；失效记录超过一定比例时自动压缩日志文件。
+    同一命名空间只应由一个进程写入。
+    '''
+    directory: str = CURRENT_DIR + '/resources/kv'
+    '''日志文件目录'''
+    compact_ratio: float = 2.0
+    '''日志记录数超过键数的该倍数时压缩'''
+    compact_min_records: int = 1024
+    '''触发压缩的最小记录数'''
+    fsync: bool = False
+    '''是否在每次写入后同步到磁盘，不启用时断电可能丢失最后几次写入，但不会损坏已有内容'''
+    journals: dict[str, _Journal] = {}
+    '''已打开的日志字典：命名空间 -> 日志'''
+    lock = threading.Lock()
+    '''日志字典锁'''
+    
+    # 配置键值存储
+    @classmethod
+    def configure(
+        cls,
+        directory: Optional[str]=None,
+        compact_ratio: Optional[float]=None,
+        compact_min_records: Optional[int]=None,
+        fsync: Optional[bool]=None
+    ) -> None:
+        '''配置键值存储，修改目录时已打开的日志将被关闭
+
+        :param directory: 日志文件目录
+        :type directory: Optional[str], optional
+        :param compact_ratio: 日志记录数超过键数的该倍数时压缩
+        :type compact_ratio: Optional[float], optional
+        :param compact_min_records: 触发压缩的最小记录数
+        :type compact_min_records: Optional[int], optional
+        :param fsync: 是否在每次写入后同步到磁盘
+        :type fsync: Optional[bool], optional
+        '''
+        if directory is not None:
+            cls.close()
+            cls.directory = directory
+        if compact_ratio is not None:
+            cls.compact_ratio = compact_ratio
+        if compact_min_records is not None:
+            cls.compact_min_records = compact_min_records
+        if fsync is not None:
+            cls.fsync = fsync
+    
+    # 获取命名空间对应的日志
+    @classmethod
+    def _get_journal(cls, namespace: str) -> _Journal:
+        '''获取命名空间对应的日志，如果没有打开则加载
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :return: 日志
+        :rtype: _Journal
+        '''
+        if (journal := cls.journals.get(namespace)) is not None:
+            return journal
+        if not namespace or os.sep in namespace or namespace.startswith('.'):
+            raise ValueError(f'不合法的命名空间：{namespace!r}')
+        with cls.lock:
+            if (journal := cls.journals.get(namespace)) is None:
+                os.makedirs(cls.directory, exist_ok=True)
+                journal = _Journal(os.path.join(cls.directory, f'{namespace}.journal'))
+                cls.journals[namespace] = journal
+            return journal
+    
+    # 读取值
+    @classmethod
+    def get(cls, namespace: str, key: str, default: Any=None) -> Any:
+        '''读取值
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :param key: 键
+        :type key: str
+        :param default: 键不存在时的返回值
+        :type default: Any, optional
+        :return: 值，字典与列表将返回副本
+        :rtype: Any
+        '''
+        value = cls._get_journal(namespace).index.get(key, default)
+        if isinstance(value, (dict, list)):
+            return deepcopy(value)
+        return value
+    
+    # 判断键是否存在
+    @classmethod
+    def contains(cls, namespace: str, key: str) -> bool:
+        '''判断键是否存在
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :param key: 键
+        :type key: str
+        :return: 是否存在
+        :rtype: bool
+        '''
+        return key in cls._get_journal(namespace).index
+    
+    # 获取所有键
+    @classmethod
+    def keys(cls, namespace: str) -> list[str]:
+        '''获取所有键
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :return: 键列表
+        :rtype: list[str]
+        '''
+        journal = cls._get_journal(namespace)
+        with journal.lock:
+            return list(journal.index.keys())
+    
+    # 命名空间读取为字典
+    @classmethod
+    def read_to_dict(cls, namespace: str) -> dict[str, Any]:
+        '''命名空间读取为字典
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :return: 命名空间内的所有内容的副本
+        :rtype: dict[str, Any]
+        '''
+        journal = cls._get_journal(namespace)
+        with journal.lock:
+            return deepcopy(journal.index)
+    
+    # 写入值
+    @classmethod
+    def set(cls, namespace: str, key: str, value: Any) -> None:
+        '''写入值
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :param key: 键
+        :type key: str
+        :param value: 值，须能被 json 序列化
+        :type value: Any
+        '''
+        cls.update(namespace, {key: value})
+    
+    # 批量写入值
+    @classmethod
+    def update(cls, namespace: str, data: Mapping[str, Any]) -> None:
+        '''批量写入值，所有记录一次追加
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :param data: 要写入的键值
+        :type data: Mapping[str, Any]
+        '''
+        if not data:
+            return None
+        records = [[str(key), value] for key, value in data.items()]
+        journal = cls._get_journal(namespace)
+        with journal.lock:
+            journal.append(records)
+    
+    # 数值增加
+    @classmethod
+    def incr(cls, namespace: str, key: str, amount: Union[int, float]=1) -> Union[int, float]:
+        '''数值增加，键不存在时视为 0
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :param key: 键
+        :type key: str
+        :param amount: 增加量
+        :type amount: Union[int, float], optional
+        :return: 增加后的值
+        :rtype: Union[int, float]
+        '''
+        journal = cls._get_journal(namespace)
+        with journal.lock:
+            value = journal.index.get(key, 0) + amount
+            journal.append([[key, value]])
+        return value
+    
+    # 删除键
+    @classmethod
+    def delete(cls, namespace: str, key: str) -> bool:
+        '''删除键
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :param key: 键
+        :type key: str
+        :return: 键是否存在
+        :rtype: bool
+        '''
+        journal = cls._get_journal(namespace)
+        with journal.lock:
+            if not key in journal.index:
+                return False
+            journal.append([[key]])
+        return True
+    
+    # 压缩日志文件
+    @classmethod
+    def compact(cls, namespace: Optional[str]=None) -> None:
+        '''立即压缩日志文件
+
+        :param namespace: 命名空间，为 `None` 时压缩所有已打开的命名空间
+        :type namespace: Optional[str], optional
+        '''
+        if namespace is None:
+            journals = list(cls.journals.values())
+        else:
+            journals = [cls._get_journal(namespace)]
+        for journal in journals:
+            with journal.lock:
+                if journal.records > len(journal.index):
+                    journal.compact()
+    
+    # 从 json 文件导入
+    @classmethod
+    def import_json(cls, namespace: str, file_name: str, overwrite: bool=False) -> int:
+        '''从 json 文件导入，文件顶层须为字典，每个顶层键成为命名空间中的一个键
+
+        :param namespace: 命名空间
+        :type namespace: str
+        :param file_name: json 文件路径
+        :type file_name: str
+        :param overwrite: 是否覆盖命名空间中已有的键
+        :type overwrite: bool, optional
+        :return: 导入的键数
+        :rtype: int
+        '''
+        if not os.path.exists(file_name):
+            raise FileNotFoundError(f'文件不存在：{file_name}')
+        data = MyJson.read_to_dict(file_name)
+        if not isinstance(data, dict):
+            raise ValueError(f'不合法的对象类型：{type(data)}: {file_name}')
+        journal = cls._get_journal(namespace)
+        if not overwrite:
+            with journal.lock:
+                data = {key: value for key, value in data.items() if not key in journal.index}
+        cls.update(namespace, data)
+        cls.compact(namespace)
+        Logging.info(f'已从 {file_name} 导入 {len(data)} 个键至命名空间 {namespace}')
+        return len(data)
+    
+    # 关闭所有日志文件
+    @classmethod
+    def close(cls) -> None:
+        '''关闭所有日志文件，之后的访问将重新加载'''
+        with cls.lock:
+            for journal in cls.journals.values():
+                journal.close()
+            cls.journals.clear()
+
+# 程序退出时关闭所有日志文件
+atexit.register(KVStore.close)
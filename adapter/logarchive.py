@@ -0,0 +1,227 @@
+'''json 行日志归档与查询。
+WindowsSov8 Anon Bot 自用 Adapter
+
+跨日后的 `log/日期.jsonl` 将被压缩为 `log/日期.jsonl.gz` ，每小时的日志为一个独立的 gzip 成员，
+并在 `log/日期.jsonl.idx` 中记录每小时日志的位置与每个群出现的小时，
+查询时只需解压相关小时的日志。压缩文件本身仍是合法的 gzip 文件，可直接使用 `zcat` 查看。
+
+命令行查询::
+
+    python -m adapter.logarchive --date 2026-10-19 --group 123456 [--hour 13] [--user 654321] [--level WARN]
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+import json
+import zlib
+import shutil
+import argparse
+from typing import Optional, Any
+from collections.abc import Iterator
+
+# 获取当前文件所在父目录
+CURRENT_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# 日志目录
+LOG_DIR = CURRENT_DIR + '/log'
+
+# 压缩一天的 json 行日志
+def archive(file_name: str) -> str:
+    '''压缩一天的 json 行日志并建立索引，完成后删除原文件。
+    该日已有压缩文件时（如跨日后才写入的日志），新的日志将作为新的 gzip 成员追加，并合并索引
+
+    :param file_name: json 行日志文件路径
+    :type file_name: str
+    :return: 压缩文件路径
+    :rtype: str
+    '''
+    gz_name = file_name + '.gz'
+    index: dict[str, Any] = {'hours': {}, 'groups': {}}
+    groups: dict[str, set[str]] = {}
+    mode = 'wb'
+    if os.path.exists(gz_name): # 在已有压缩文件的副本后追加，不覆盖已压缩的日志
+        if os.path.exists(file_name + '.idx'):
+            with open(file_name + '.idx', 'r', encoding='utf-8') as file:
+                index = json.load(file)
+            groups = {group_id: set(hours) for group_id, hours in index['groups'].items()}
+        shutil.copyfile(gz_name, gz_name + '.tmp')
+        mode = 'ab'
+
+    with open(file_name, 'rb') as source, open(gz_name + '.tmp', mode) as target:
+        hour: Optional[str] = None
+        compressor = None
+        offset = target.seek(0, os.SEEK_END)
+
+        # 结束当前小时的 gzip 成员
+        def finish() -> None:
+            nonlocal offset
+            if compressor is None:
+                return None
+            target.write(compressor.flush())
+            index['hours'].setdefault(hour, []).append([offset, target.tell() - offset])
+            offset = target.tell()
+
+        for line in source:
+            try:
+                record = json.loads(line)
+            except ValueError: # 损坏的记录归入当前小时
+                record = {}
+            record_hour = str(record.get('time', ''))[11:13] or hour or '00'
+            if record_hour != hour: # 每小时开始一个新的 gzip 成员
+                finish()
+                hour = record_hour
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            target.write(compressor.compress(line))
+            if (group_id := record.get('group_id')) is not None:
+                groups.setdefault(str(group_id), set()).add(hour)
+        finish()
+        target.flush()
+        os.fsync(target.fileno())
+
+    index['groups'] = {group_id: sorted(hours) for group_id, hours in groups.items()}
+    with open(file_name + '.idx.tmp', 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False)
+    os.replace(gz_name + '.tmp', gz_name)
+    os.replace(file_name + '.idx.tmp', file_name + '.idx')
+    os.remove(file_name)
+    return gz_name
+
+# 压缩所有早于指定日期的 json 行日志
+def archive_before(date: str, directory: str=LOG_DIR) -> list[str]:
+    '''压缩所有早于指定日期的 json 行日志
+
+    :param date: 日期，格式为 `YYYY-MM-DD`
+    :type date: str
+    :param directory: 日志目录
+    :type directory: str, optional
+    :return: 压缩文件路径列表
+    :rtype: list[str]
+    '''
+    archived = []
+    if not os.path.isdir(directory):
+        return archived
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.jsonl') and name[:-len('.jsonl')] < date:
+            try:
+                archived.append(archive(os.path.join(directory, name)))
+            except FileNotFoundError: # 已被其他进程压缩
+                continue
+    return archived
+
+# 查询日志
+def query(
+    date: str,
+    group_id: Optional[int]=None,
+    user_id: Optional[int]=None,
+    hours: Optional[set[str]]=None,
+    level: Optional[str]=None,
+    directory: str=LOG_DIR
+) -> Iterator[dict[str, Any]]:
+    '''查询日志，已压缩的日志只解压索引中相关小时的部分
+
+    :param date: 日期，格式为 `YYYY-MM-DD`
+    :type date: str
+    :param group_id: 群号
+    :type group_id: Optional[int], optional
+    :param user_id: QQ 号
+    :type user_id: Optional[int], optional
+    :param hours: 小时集合，如 `{'09', '13'}`
+    :type hours: Optional[set[str]], optional
+    :param level: 日志等级
+    :type level: Optional[str], optional
+    :param directory: 日志目录
+    :type directory: str, optional
+    :return: 符合条件的日志记录迭代器
+    :rtype: Iterator[dict[str, Any]]
+    '''
+    file_name = os.path.join(directory, f'{date}.jsonl')
+    if os.path.exists(file_name + '.gz'):
+        with open(file_name + '.idx', 'r', encoding='utf-8') as file:
+            index = json.load(file)
+        selected = set(index['hours'])
+        if group_id is not None:
+            selected &= set(index['groups'].get(str(group_id), ()))
+        if hours is not None:
+            selected &= hours
+        lines = _read_members(
+            file_name + '.gz',
+            sorted(segment for hour in selected for segment in index['hours'][hour])
+        )
+    elif os.path.exists(file_name): # 当天尚未压缩的日志
+        lines = _read_lines(file_name)
+    else:
+        return None
+
+    # 先按字节粗筛，只解析可能符合条件的记录
+    needle = f'"group_id": {group_id}'.encode() if group_id is not None else None
+    for line in lines:
+        if needle is not None and not needle in line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if group_id is not None and record.get('group_id') != group_id:
+            continue
+        if user_id is not None and record.get('user_id') != user_id:
+            continue
+        if hours is not None and str(record.get('time', ''))[11:13] not in hours:
+            continue
+        if level is not None and record.get('level') != level:
+            continue
+        yield record
+
+# 读取未压缩的日志
+def _read_lines(file_name: str) -> Iterator[bytes]:
+    '''读取未压缩的日志
+
+    :param file_name: json 行日志文件路径
+    :type file_name: str
+    :return: 日志行迭代器
+    :rtype: Iterator[bytes]
+    '''
+    with open(file_name, 'rb') as file:
+        yield from file
+
+# 读取指定的 gzip 成员
+def _read_members(file_name: str, segments: list[list[int]]) -> Iterator[bytes]:
+    '''读取指定的 gzip 成员
+
+    :param file_name: 压缩文件路径
+    :type file_name: str
+    :param segments: 成员位置列表：[偏移, 长度]
+    :type segments: list[list[int]]
+    :return: 日志行迭代器
+    :rtype: Iterator[bytes]
+    '''
+    with open(file_name, 'rb') as file:
+        for offset, length in segments:
+            file.seek(offset)
+            yield from zlib.decompress(file.read(length), 31).splitlines()
+
+# 命令行入口
+def main(argv: Optional[list[str]]=None) -> int:
+    '''命令行入口，将符合条件的日志记录以 json 行输出
+
+    :param argv: 命令行参数
+    :type argv: Optional[list[str]], optional
+    :return: 退出码
+    :rtype: int
+    '''
+    parser = argparse.ArgumentParser(prog='python -m adapter.logarchive', description='查询 json 行日志')
+    parser.add_argument('--date', required=True, help='日期，格式为 YYYY-MM-DD')
+    parser.add_argument('--group', type=int, help='群号')
+    parser.add_argument('--user', type=int, help='QQ 号')
+    parser.add_argument('--hour', action='append', help='小时，如 09 ，可指定多次')
+    parser.add_argument('--level', help='日志等级')
+    parser.add_argument('--dir', default=LOG_DIR, help='日志目录')
+    args = parser.parse_args(argv)
+
+    hours = {hour.zfill(2) for hour in args.hour} if args.hour else None
+    for record in query(args.date, args.group, args.user, hours, args.level, args.dir):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,22 +4,95 @@ WindowsSov8 Anon Bot 自用 Adapter
 # -*- coding: utf-8 -*-
 # !/usr/bin/python3
 import re
+import json
 from io import BytesIO
 from pathlib import Path
-from copy import deepcopy
+from types import MappingProxyType
 from pydantic import BaseModel
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping
 from typing import Iterable, Optional, Literal, Union, Any
 
-from .utils import f2s, escape, unescape
+from .utils import ImageOptimizer, f2s, escape, unescape
 
-# 消息段类
-class MessageSegment(BaseModel):
-    '''消息段类'''
+# 消息段数据模型
+class MessageSegmentModel(BaseModel):
+    '''消息段数据模型，仅在需要校验外部数据时使用'''
     type: str
     '''消息段类型'''
     data: dict[str, Any]
     '''消息段数据'''
+
+# 转换为可哈希的形式
+def _hashable(value: Any) -> Any:
+    '''转换为可哈希的形式，字典转换为键值对的 `frozenset` ，列表转换为元组，相等的值转换结果也相等
+
+    :param value: 消息段数据中的值
+    :type value: Any
+    :return: 可哈希的值
+    :rtype: Any
+    '''
+    if isinstance(value, Mapping):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+# 消息段类
+class MessageSegment:
+    '''消息段类，创建后不可修改'''
+    __slots__ = ('type', 'data')
+    type: str
+    '''消息段类型'''
+    data: Mapping[str, Any]
+    '''消息段数据'''
+    # 创建一个消息段
+    def __init__(self, type: str, data: Mapping[str, Any]) -> None:
+        '''消息段类
+
+        :param type: 消息段类型
+        :type type: str
+        :param data: 消息段数据
+        :type data: Mapping[str, Any]
+        '''
+        object.__setattr__(self, 'type', type)
+        object.__setattr__(self, 'data', MappingProxyType(dict(data)))
+    
+    # 禁止修改属性
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f'消息段不可修改：{name}')
+    
+    # 禁止删除属性
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f'消息段不可修改：{name}')
+    
+    # 不可变对象的拷贝即为自身
+    def __copy__(self) -> 'MessageSegment':
+        return self
+    
+    # 不可变对象的深拷贝即为自身
+    def __deepcopy__(self, memo: dict[int, Any]) -> 'MessageSegment':
+        return self
+    
+    # 定义序列化行为
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (self.__class__, (self.type, dict(self.data)))
+    
+    # 定义相等行为
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MessageSegment):
+            return NotImplemented
+        return self.type == other.type and self.data == other.data
+    
+    # 定义哈希行为
+    def __hash__(self) -> int:
+        return hash((self.type, _hashable(self.data)))
+    
+    # 定义表示方法
+    def __repr__(self) -> str:
+        return f'MessageSegment(type={self.type!r}, data={dict(self.data)!r})'
+    
     # 将消息段转换为 CQ 码字符串
     def __str__(self) -> str:
         '''将消息段转换为 CQ 码字符串'''
@@ -31,6 +104,20 @@ class MessageSegment(BaseModel):
         )
         return f"[{self.type}{',' if params else ''}{params}]"
     
+    # 逐段生成 CQ 码字符串
+    def _iter_cq(self) -> Iterable[str]:
+        '''逐段生成 CQ 码字符串，拼接结果与 `str(self)` 相同'''
+        if self.is_text():
+            yield escape(self.data.get('text', ''), escape_comma=False)
+            return
+        
+        yield f'[{self.type}'
+        for key, value in self.data.items():
+            if value is not None:
+                yield f',{key}='
+                yield str(value)
+        yield ']'
+    
     # 定义加法行为
     def __add__(
         self, other: Union[str, 'MessageSegment', Iterable['MessageSegment']]
@@ -47,6 +134,38 @@ class MessageSegment(BaseModel):
             MessageSegment.text(other) if isinstance(other, str) else Message(other)
         ) + self
     
+    # 从外部数据校验并创建消息段
+    @classmethod
+    def model_validate(cls, obj: Any) -> 'MessageSegment':
+        '''从外部数据校验并创建消息段
+
+        :param obj: 外部数据，通常为 `{'type': ..., 'data': {...}}` 字典
+        :type obj: Any
+        :return: 消息段对象
+        :rtype: MessageSegment
+        '''
+        if isinstance(obj, MessageSegment):
+            return obj
+        model = MessageSegmentModel.model_validate(obj)
+        return cls(model.type, model.data)
+    
+    # 转换为 pydantic 模型
+    def to_model(self) -> MessageSegmentModel:
+        '''转换为 pydantic 模型'''
+        return MessageSegmentModel(type=self.type, data=self.model_dump()['data'])
+    
+    # 转换为可序列化的字典
+    def model_dump(self) -> dict[str, Any]:
+        '''转换为可序列化的字典'''
+        data = {}
+        for key, value in self.data.items():
+            if isinstance(value, MessageSegment):
+                value = value.model_dump()
+            elif isinstance(value, Message):
+                value = value.__list__
+            data[key] = value
+        return {'type': self.type, 'data': data}
+    
     # 返回消息段是否为字符串
     def is_text(self) -> bool:
         '''返回消息段是否为字符串'''
@@ -281,6 +400,11 @@ class MessageSegment(BaseModel):
         :return: 消息段对象
         :rtype: MessageSegment
         '''
+        # 启用图片优化时处理二进制图片
+        if ImageOptimizer.enabled and isinstance(file, (bytes, BytesIO)):
+            file = ImageOptimizer.optimize(
+                file.getvalue() if isinstance(file, BytesIO) else file
+            )
         return MessageSegment(
             type='image',
             data={
@@ -392,7 +516,7 @@ class MessageSegment(BaseModel):
     def node_custom(
         name: str,
         uin: int,
-        content: Union[str, 'MessageSegment'],
+        content: Union[str, 'MessageSegment', 'Message'],
         seq: Optional[int]=None
     ) -> 'MessageSegment':
         '''自定义合并转发消息节点
@@ -402,7 +526,7 @@ class MessageSegment(BaseModel):
         :param uin: 发送者QQ号
         :type uin: int
         :param content: 具体消息
-        :type content: Union[str, &#39;MessageSegment&#39;]
+        :type content: Union[str, &#39;MessageSegment&#39;, &#39;Message&#39;]
         :param seq: 具体消息
         :type seq: Optional[int], optional
         :return: 消息段对象
@@ -455,20 +579,33 @@ class MessageSegment(BaseModel):
 # 消息数组类
 class Message(list[MessageSegment]):
     '''消息数组'''
+    __slots__ = ('_cq_string', '_plain_text', '_json', '_index')
     # 初始化方法
-    def __init__(self, message: Union[str, None, Iterable[MessageSegment], MessageSegment]=None):
+    def __init__(
+        self, message: Union[str, None, Iterable[MessageSegment], MessageSegment, 'SerializedMessage']=None
+    ):
         '''消息数组
 
-        :param message: 消息内容
-        :type message: Union[str, None, Iterable[MessageSegment], MessageSegment], optional
+        :param message: 消息内容，已序列化的消息将被反序列化
+        :type message: Union[str, None, Iterable[MessageSegment], MessageSegment, SerializedMessage], optional
         '''
         super().__init__()
+        self._cq_string: Optional[str] = None
+        '''CQ 码字符串缓存'''
+        self._plain_text: Optional[str] = None
+        '''纯文本缓存'''
+        self._json: Optional[SerializedMessage] = None
+        '''JSON 序列化结果缓存'''
+        self._index: Optional[dict[str, list[int]]] = {}
+        '''消息段类型到位置的索引，为 `None` 时将在下次查询时重建'''
         if message is None: # 如果没有
             return
         elif isinstance(message, str): # 如果是字符串
             self.extend(self._construct(message))
         elif isinstance(message, MessageSegment): # 如果是消息段
             self.append(message)
+        elif isinstance(message, SerializedMessage): # 如果是已序列化的消息
+            self.extend(message.to_message())
         elif isinstance(message, Iterable): # 如果是可迭代的消息段对象
             self.extend(message)
         else: # 其他对象
@@ -476,12 +613,14 @@ class Message(list[MessageSegment]):
     
     # 将消息段转换为 CQ 码字符串
     def __str__(self) -> str:
-        '''将消息段转换为 CQ 码字符串'''
-        return ''.join(str(seg) for seg in self)
+        '''将消息段转换为 CQ 码字符串，结果将被缓存至消息数组被修改'''
+        if self._cq_string is None:
+            self._cq_string = ''.join(str(seg) for seg in self)
+        return self._cq_string
     
     # 定义加法行为
     def __add__(
-        self, other: Union[str, MessageSegment, Iterable[MessageSegment]]
+        self, other: Union[str, MessageSegment, Iterable[MessageSegment], 'SerializedMessage']
     ) -> 'Message':
         result = self.copy()
         other = MessageSegment.text(other) if isinstance(other, str) else other
@@ -494,45 +633,267 @@ class Message(list[MessageSegment]):
     ) -> 'Message':
         other = MessageSegment.text(other) if isinstance(other, str) else other
         result = self.__class__(other)
-        return result + self
+        result += self
+        return result
     
     # 定义原地加法行为
     def __iadd__(
-        self, other: Union[str, MessageSegment, Iterable[MessageSegment]]
+        self, other: Union[str, MessageSegment, Iterable[MessageSegment], 'SerializedMessage']
     ) -> 'Message':
         if isinstance(other, str):
             self.extend(self._construct(other))
         elif isinstance(other, MessageSegment):
             self.append(other)
+        elif isinstance(other, SerializedMessage):
+            self.extend(other.to_message())
         elif isinstance(other, Iterable):
             self.extend(other)
         else:
             raise TypeError(f'不支持的类型：{type(other)!r}')
         return self
     
+    # 消息数组被修改时的处理
+    def _mutated(self) -> None:
+        '''消息数组被修改时的处理，清除缓存与索引'''
+        self._cq_string = None
+        self._plain_text = None
+        self._json = None
+        self._index = None
+    
+    # 获取消息段类型索引
+    def _get_index(self) -> dict[str, list[int]]:
+        '''获取消息段类型索引，若已失效则重建'''
+        if self._index is None:
+            index: dict[str, list[int]] = {}
+            for position, seg in enumerate(self):
+                index.setdefault(seg.type, []).append(position)
+            self._index = index
+        return self._index
+    
+    # 获取第一个指定类型的消息段
+    def first(self, type_: str) -> Optional[MessageSegment]:
+        '''获取第一个指定类型的消息段
+
+        :param type_: 消息段类型
+        :type type_: str
+        :return: 消息段对象，不存在时返回 `None`
+        :rtype: Optional[MessageSegment]
+        '''
+        positions = self._get_index().get(type_)
+        return self[positions[0]] if positions else None
+    
+    # 获取所有指定类型的消息段
+    def all(self, type_: str) -> list[MessageSegment]:
+        '''获取所有指定类型的消息段
+
+        :param type_: 消息段类型
+        :type type_: str
+        :return: 消息段列表
+        :rtype: list[MessageSegment]
+        '''
+        return [self[position] for position in self._get_index().get(type_, ())]
+    
+    # 是否 @ 了指定 QQ 号
+    def mentions(self, user_id: Union[int, str]) -> bool:
+        '''返回消息是否 @ 了指定 QQ 号
+
+        :param user_id: QQ 号
+        :type user_id: Union[int, str]
+        :return: 是否 @ 了指定 QQ 号
+        :rtype: bool
+        '''
+        user_id = str(user_id)
+        return any(str(seg.data.get('qq', '')) == user_id for seg in self.all('at'))
+    
+    # 是否只包含指定类型的消息段
+    def only(self, type_: str) -> bool:
+        '''返回消息是否只包含指定类型的消息段，空消息视为满足
+
+        :param type_: 消息段类型
+        :type type_: str
+        :return: 是否只包含指定类型的消息段
+        :rtype: bool
+        '''
+        index = self._get_index()
+        return len(index) == 0 or (len(index) == 1 and type_ in index)
+    
+    # 定义下标赋值行为
+    def __setitem__(self, index: Any, value: Any) -> None:
+        if isinstance(index, slice):
+            value = list(self.__class__(value))
+        elif not isinstance(value, MessageSegment):
+            raise ValueError(f'不合法的对象类型：{type(value)}: {value}')
+        super().__setitem__(index, value)
+        self._mutated()
+    
+    # 定义下标删除行为
+    def __delitem__(self, index: Any) -> None:
+        super().__delitem__(index)
+        self._mutated()
+    
+    # 定义原地乘法行为
+    def __imul__(self, value: Any) -> 'Message':
+        super().__imul__(value)
+        self._mutated()
+        return self
+    
+    # 插入消息段
+    def insert(self, index: Any, obj: MessageSegment) -> None:
+        '''在指定位置插入消息段
+
+        :param index: 插入位置
+        :type index: SupportsIndex
+        :param obj: 要插入的消息段
+        :type obj: MessageSegment
+        :raises ValueError: 消息段类型不合法
+        '''
+        if not isinstance(obj, MessageSegment):
+            raise ValueError(f'不合法的对象类型：{type(obj)}: {obj}')
+        super().insert(index, obj)
+        self._mutated()
+    
+    # 弹出消息段
+    def pop(self, index: Any=-1) -> MessageSegment:
+        '''弹出指定位置的消息段'''
+        result = super().pop(index)
+        self._mutated()
+        return result
+    
+    # 移除消息段
+    def remove(self, value: MessageSegment) -> None:
+        '''移除第一个与之相等的消息段'''
+        super().remove(value)
+        self._mutated()
+    
+    # 清空消息数组
+    def clear(self) -> None:
+        '''清空消息数组'''
+        super().clear()
+        self._mutated()
+    
+    # 排序消息数组
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        '''排序消息数组'''
+        super().sort(*args, **kwargs)
+        self._mutated()
+    
+    # 反转消息数组
+    def reverse(self) -> None:
+        '''反转消息数组'''
+        super().reverse()
+        self._mutated()
+    
+    # 提取消息中的纯文本
+    def extract_plain_text(self) -> str:
+        '''提取消息中的纯文本（不转义），结果将被缓存至消息数组被修改'''
+        if self._plain_text is None:
+            self._plain_text = ''.join(
+                seg.data.get('text', '') for seg in self if seg.is_text()
+            )
+        return self._plain_text
+    
+    # 检测 CQ 码字符串前缀
+    def startswith(self, prefix: str) -> bool:
+        '''检测消息的 CQ 码字符串是否以指定前缀开头，结果等同于
+        `str(self).startswith(prefix)` ，但只会生成前缀长度内的内容，
+        不会序列化前缀之后的消息段（如图片的 base64 数据）
+
+        :param prefix: 要检测的前缀
+        :type prefix: str
+        :return: 是否以指定前缀开头
+        :rtype: bool
+        '''
+        if self._cq_string is not None:
+            return self._cq_string.startswith(prefix)
+        
+        position = 0
+        for seg in self:
+            for part in seg._iter_cq():
+                if position >= len(prefix):
+                    return True
+                part = part[:len(prefix) - position]
+                if not prefix.startswith(part, position):
+                    return False
+                position += len(part)
+        return position >= len(prefix)
+    
     # 定义 list 属性
     @property
     def __list__(self) -> list[dict[str, Any]]:
         '''`list` 属性'''
         return [seg.model_dump() for seg in self]
     
+    # 分页
+    def paginate(self, max_length: int) -> list['Message']:
+        '''按长度将消息分页，优先在消息段与行的边界处分割，单行过长时强制分割。
+        非文本消息段计为 1 个字符
+
+        :param max_length: 每页最大长度
+        :type max_length: int
+        :return: 分页后的消息数组列表
+        :rtype: list[Message]
+        '''
+        if max_length < 1:
+            raise ValueError(f'不合法的每页最大长度：{max_length}')
+        pages: list[Message] = [self.__class__()]
+        length = 0 # 当前页长度
+        buffer = '' # 当前页未写入的文本
+        
+        # 将文本写入当前页
+        def flush() -> None:
+            nonlocal buffer
+            if buffer:
+                pages[-1].append(MessageSegment.text(buffer))
+                buffer = ''
+        
+        # 开始新的一页
+        def new_page() -> None:
+            nonlocal length
+            flush()
+            if pages[-1]:
+                pages.append(self.__class__())
+            length = 0
+        
+        for seg in self:
+            if not seg.is_text(): # 非文本消息段不可分割
+                if length + 1 > max_length:
+                    new_page()
+                flush()
+                pages[-1].append(seg)
+                length += 1
+                continue
+            
+            for line in seg.data.get('text', '').splitlines(keepends=True):
+                if length > 0 and length + len(line) > max_length:
+                    new_page()
+                while line:
+                    piece = line[:max_length - length]
+                    buffer += piece
+                    length += len(piece)
+                    line = line[len(piece):]
+                    if line: # 单行过长
+                        new_page()
+            flush() # 保持原有的消息段边界
+        flush()
+        
+        return [page for page in pages if page]
+    
+    # 序列化为 JSON 消息数组
+    def serialize(self) -> 'SerializedMessage':
+        '''序列化为 JSON 消息数组，结果将被缓存至消息数组被修改'''
+        if self._json is None:
+            self._json = SerializedMessage(json.dumps(self.__list__))
+        return self._json
+    
     # 是否为纯文本消息
     def is_text(self) -> bool:
         '''返回是否为纯文本消息'''
-        for seg in self:
-            if not seg.is_text():
-                return False
-        
-        return True
+        return self.only('text')
     
     # 是否为合并转发消息
     def is_forward(self) -> bool:
         '''返回是否为合并转发消息，该类消息只允许 node 类型消息段'''
-        for seg in self:
-            if seg.type != 'node':
-                return False
-        
-        return True
+        return self.only('node')
     
     # 构造消息数组
     @staticmethod
@@ -586,17 +947,25 @@ class Message(list[MessageSegment]):
                 )
     
     # 添加一个消息段到消息数组末尾
-    def append(self, obj: Union[str, MessageSegment]) -> 'Message':
+    def append(self, obj: Union[str, MessageSegment, Mapping[str, Any]]) -> 'Message':
         '''添加一个消息段到消息数组末尾
 
-        :param obj: 要添加的消息段
-        :type obj: Union[str, MessageSegment]
+        :param obj: 要添加的消息段，字典形式的消息段将经过校验后添加
+        :type obj: Union[str, MessageSegment, Mapping[str, Any]]
         :raises ValueError: 消息段类型不合法
         :return: 添加后的消息数组
         :rtype: Message
         '''        
+        if isinstance(obj, Mapping): # 如果是消息段字典
+            obj = MessageSegment.model_validate(obj)
         if isinstance(obj, MessageSegment): # 如果是消息段
             super().append(obj)
+            # 清除缓存并增量更新索引
+            self._cq_string = None
+            self._plain_text = None
+            self._json = None
+            if self._index is not None:
+                self._index.setdefault(obj.type, []).append(len(self) - 1)
         elif isinstance(obj, str): # 如果是字符串
             self.extend(self._construct(obj))
         else:
@@ -616,8 +985,205 @@ class Message(list[MessageSegment]):
             self.append(segment)
         return self
     
+    # 定义序列化行为
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (self.__class__, (list(self),))
+    
+    # 定义拷贝行为
+    def __copy__(self) -> 'Message':
+        return self.copy()
+    
+    # 定义深拷贝行为，消息段不可修改，因此与拷贝相同
+    def __deepcopy__(self, memo: dict[int, Any]) -> 'Message':
+        return self.copy()
+    
     # 重写拷贝方法
     def copy(self) -> 'Message':
-        '''返回对象的深拷贝对象'''
-        return deepcopy(self)
-    
\ No newline at end of file
+        '''返回对象的拷贝对象，消息段不可修改，因此直接共享'''
+        result = self.__class__()
+        list.extend(result, self)
+        result._cq_string = self._cq_string
+        result._plain_text = self._plain_text
+        result._json = self._json
+        if self._index is not None:
+            result._index = {key: value.copy() for key, value in self._index.items()}
+        else:
+            result._index = None
+        return result
+    
+
+# 已序列化的消息
+class SerializedMessage:
+    '''已序列化为 JSON 消息数组的消息，可直接作为 `send_msg` 的 `message` 参数发送。
+
+    不是 `str` 的子类，以免在接受字符串的位置被当作纯文本，与消息拼接时将先反序列化
+    '''
+    __slots__ = ('payload',)
+    # 创建一个已序列化的消息
+    def __init__(self, payload: str) -> None:
+        '''已序列化的消息
+
+        :param payload: JSON 消息数组文本
+        :type payload: str
+        '''
+        self.payload = payload
+        '''JSON 消息数组文本'''
+    
+    # 返回 JSON 消息数组文本
+    def __str__(self) -> str:
+        return self.payload
+    
+    # 定义打印行为
+    def __repr__(self) -> str:
+        return f'SerializedMessage({self.payload!r})'
+    
+    # 定义比较行为
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, SerializedMessage) and other.payload == self.payload
+    
+    # 定义哈希行为
+    def __hash__(self) -> int:
+        return hash(self.payload)
+    
+    # 定义加法行为
+    def __add__(
+        self, other: Union[str, MessageSegment, Iterable[MessageSegment], 'SerializedMessage']
+    ) -> Message:
+        return self.to_message() + other
+    
+    # 定义反向加法行为
+    def __radd__(self, other: Union[str, MessageSegment, Iterable[MessageSegment]]) -> Message:
+        return self.to_message().__radd__(other)
+    
+    # 转换为消息数组
+    def to_message(self) -> Message:
+        '''反序列化为消息数组'''
+        return Message(json.loads(self.payload))
+
+# 消息模板插槽
+class TemplateSlot:
+    '''消息模板插槽'''
+    __slots__ = ('name', 'type', 'key', 'kind', 'data')
+    # 创建一个消息模板插槽
+    def __init__(
+        self,
+        name: str,
+        type_: str='text',
+        key: str='text',
+        kind: type=str,
+        data: Optional[dict[str, Any]]=None
+    ) -> None:
+        '''消息模板插槽
+
+        :param name: 插槽名，渲染时以同名关键字参数填入
+        :type name: str
+        :param type_: 插槽所在消息段类型
+        :type type_: str, optional
+        :param key: 插槽在消息段数据中的键
+        :type key: str, optional
+        :param kind: 插槽值类型，渲染时将据此转换
+        :type kind: type, optional
+        :param data: 消息段中其余固定的数据
+        :type data: Optional[dict[str, Any]], optional
+        '''
+        self.name = name
+        '''插槽名'''
+        self.type = type_
+        '''插槽所在消息段类型'''
+        self.key = key
+        '''插槽在消息段数据中的键'''
+        self.kind = kind
+        '''插槽值类型'''
+        self.data = data or {}
+        '''消息段中其余固定的数据'''
+
+# 消息模板
+class MessageTemplate:
+    '''消息模板，创建时预先序列化固定部分，渲染时只填入插槽
+
+    例如::
+
+        ADMIN_ADDED = MessageTemplate(
+            '<√> ',
+            MessageTemplate.slot('target', 'at', 'qq', int, {'name': None}),
+            ' 已被设置为管理员。'
+        )
+        bot.send(event, ADMIN_ADDED.render(target=user_id))
+    '''
+    # 插槽值占位符
+    _PLACEHOLDER = '\x00slot\x00'
+    # 创建一个消息模板
+    def __init__(self, *parts: Union[str, MessageSegment, TemplateSlot]) -> None:
+        '''消息模板
+
+        :param parts: 模板内容，字符串将视为纯文本消息段
+        :type parts: Union[str, MessageSegment, TemplateSlot]
+        :raises TypeError: 不合法的模板内容
+        '''
+        self._chunks: list[str] = []
+        '''预序列化的 JSON 片段，插槽位于相邻片段之间'''
+        self._slots: list[TemplateSlot] = []
+        '''按顺序排列的插槽'''
+        
+        chunk = '['
+        for index, part in enumerate(parts):
+            if index > 0:
+                chunk += ', '
+            if isinstance(part, str):
+                part = MessageSegment.text(part)
+            if isinstance(part, MessageSegment):
+                chunk += json.dumps(part.model_dump())
+            elif isinstance(part, TemplateSlot):
+                data = {part.key: self._PLACEHOLDER, **part.data}
+                before, after = json.dumps(
+                    {'type': part.type, 'data': data}
+                ).split(json.dumps(self._PLACEHOLDER))
+                self._chunks.append(chunk + before)
+                self._slots.append(part)
+                chunk = after
+            else:
+                raise TypeError(f'不合法的模板内容：{type(part)!r}')
+        self._chunks.append(chunk + ']')
+    
+    # 创建插槽
+    @staticmethod
+    def slot(
+        name: str,
+        type_: str='text',
+        key: str='text',
+        kind: type=str,
+        data: Optional[dict[str, Any]]=None
+    ) -> TemplateSlot:
+        '''创建插槽
+
+        :param name: 插槽名，渲染时以同名关键字参数填入
+        :type name: str
+        :param type_: 插槽所在消息段类型，默认为纯文本
+        :type type_: str, optional
+        :param key: 插槽在消息段数据中的键
+        :type key: str, optional
+        :param kind: 插槽值类型，渲染时将据此转换
+        :type kind: type, optional
+        :param data: 消息段中其余固定的数据
+        :type data: Optional[dict[str, Any]], optional
+        :return: 插槽对象
+        :rtype: TemplateSlot
+        '''
+        return TemplateSlot(name, type_, key, kind, data)
+    
+    # 渲染模板
+    def render(self, **values: Any) -> SerializedMessage:
+        '''渲染模板
+
+        :raises KeyError: 缺少插槽值
+        :return: 已序列化的消息
+        :rtype: SerializedMessage
+        '''
+        result = [self._chunks[0]]
+        for slot, chunk in zip(self._slots, self._chunks[1:]):
+            value = values[slot.name]
+            if not isinstance(value, slot.kind):
+                value = slot.kind(value)
+            result.append(json.dumps(value))
+            result.append(chunk)
+        return SerializedMessage(''.join(result))
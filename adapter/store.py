@@ -0,0 +1,227 @@
+'''Bot 状态存储。
+WindowsSov8 Anon Bot 自用 Adapter
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Optional, Iterator, Iterable
+
+from .utils import MyJson, Logging
+
+# SQLite 状态存储类
+class StateStore:
+    '''SQLite 状态存储类，以 WAL 模式保存管理员列表与各群黑名单，可被多个进程同时读写'''
+    # 创建一个状态存储
+    def __init__(self, file_name: str, migrate_from: Optional[str]=None, timeout: float=5.0) -> None:
+        '''SQLite 状态存储类
+    
+        :param file_name: 数据库文件路径
+        :type file_name: str
+        :param migrate_from: 要迁移的 Bot 信息 json 文件路径，只会在数据库首次创建时迁移一次
+        :type migrate_from: Optional[str], optional
+        :param timeout: 等待其他进程释放写锁的秒数
+        :type timeout: float, optional
+        '''
+        self.file_name = file_name
+        '''数据库文件路径'''
+        self.lock = threading.Lock()
+        '''连接锁'''
+        self.connection = sqlite3.connect(
+            file_name,
+            timeout=timeout,
+            isolation_level=None, # 手动管理事务
+            check_same_thread=False
+        )
+        '''数据库连接'''
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.lock:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS admins (
+                    user_id INTEGER PRIMARY KEY
+                );
+                CREATE TABLE IF NOT EXISTS group_blocks (
+                    group_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    PRIMARY KEY (group_id, name)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            ''')
+        if migrate_from is not None:
+            self.migrate_from_json(migrate_from)
+    
+    # 开启写事务
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        '''开启写事务，事务开始时即获取写锁，避免多进程写入时的死锁'''
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+            else:
+                self.connection.execute('COMMIT')
+    
+    # 从 json 文件迁移
+    def migrate_from_json(self, file_name: str) -> bool:
+        '''从 Bot 信息 json 文件迁移，已迁移过时不做处理
+    
+        :param file_name: Bot 信息 json 文件路径
+        :type file_name: str
+        :return: 是否进行了迁移
+        :rtype: bool
+        '''
+        with self._transaction():
+            if self.connection.execute(
+                "SELECT 1 FROM meta WHERE key = 'migrated_from_json'"
+            ).fetchone() is not None:
+                return False
+            if os.path.exists(file_name):
+                bot_info = MyJson.read_to_dict(file_name, readonly=True)
+                self.connection.executemany(
+                    'INSERT OR IGNORE INTO admins (user_id) VALUES (?)',
+                    [(int(user_id),) for user_id in bot_info.get('admin_list', [])]
+                )
+                self.connection.executemany(
+                    'INSERT OR IGNORE INTO group_blocks (group_id, name) VALUES (?, ?)',
+                    [
+                        (str(group_id), name)
+                        for group_id, block_list in bot_info.get('group_block_list', {}).items()
+                        for name in block_list
+                    ]
+                )
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                (file_name,)
+            )
+        Logging.info(f'已从 {file_name} 迁移 Bot 信息至 {self.file_name}')
+        return True
+    
+    # 获取数据版本
+    def data_version(self) -> int:
+        '''获取数据版本，其他连接（包括其他进程）提交修改后该值将发生变化
+    
+        :return: 数据版本
+        :rtype: int
+        '''
+        with self.lock:
+            return self.connection.execute('PRAGMA data_version').fetchone()[0]
+    
+    # 获取管理员列表
+    def admin_list(self) -> list[int]:
+        '''获取管理员列表
+    
+        :return: 管理员 ID 列表
+        :rtype: list[int]
+        '''
+        with self.lock:
+            return [row[0] for row in self.connection.execute(
+                'SELECT user_id FROM admins ORDER BY user_id'
+            )]
+    
+    # 添加管理员
+    def add_admin(self, user_id: int) -> bool:
+        '''添加管理员
+    
+        :param user_id: 要添加的 ID
+        :type user_id: int
+        :return: 是否有修改
+        :rtype: bool
+        '''
+        with self._transaction():
+            return self.connection.execute(
+                'INSERT OR IGNORE INTO admins (user_id) VALUES (?)', (user_id,)
+            ).rowcount > 0
+    
+    # 移除管理员
+    def remove_admin(self, user_id: int) -> bool:
+        '''移除管理员
+    
+        :param user_id: 要移除的 ID
+        :type user_id: int
+        :return: 是否有修改
+        :rtype: bool
+        '''
+        with self._transaction():
+            return self.connection.execute(
+                'DELETE FROM admins WHERE user_id = ?', (user_id,)
+            ).rowcount > 0
+    
+    # 获取所有群的黑名单
+    def block_dict(self) -> dict[str, frozenset[str]]:
+        '''获取所有群的黑名单
+    
+        :return: 各群黑名单：群号 -> 被屏蔽的插件或功能集合
+        :rtype: dict[str, frozenset[str]]
+        '''
+        block_dict: dict[str, set[str]] = {}
+        with self.lock:
+            for group_id, name in self.connection.execute(
+                'SELECT group_id, name FROM group_blocks'
+            ):
+                block_dict.setdefault(group_id, set()).add(name)
+        return {group_id: frozenset(names) for group_id, names in block_dict.items()}
+    
+    # 屏蔽插件
+    def block(self, group_id: int, name: str) -> bool:
+        '''屏蔽插件
+    
+        :param group_id: 群号
+        :type group_id: int
+        :param name: 插件或功能名
+        :type name: str
+        :return: 是否有修改
+        :rtype: bool
+        '''
+        with self._transaction():
+            return self.connection.execute(
+                'INSERT OR IGNORE INTO group_blocks (group_id, name) VALUES (?, ?)',
+                (str(group_id), name)
+            ).rowcount > 0
+    
+    # 取消屏蔽插件
+    def allow(self, group_id: int, name: str) -> bool:
+        '''取消屏蔽插件
+    
+        :param group_id: 群号
+        :type group_id: int
+        :param name: 插件或功能名
+        :type name: str
+        :return: 是否有修改
+        :rtype: bool
+        '''
+        with self._transaction():
+            return self.connection.execute(
+                'DELETE FROM group_blocks WHERE group_id = ? AND name = ?',
+                (str(group_id), name)
+            ).rowcount > 0
+    
+    # 设置群黑名单
+    def set_block_list(self, group_id: int, names: Iterable[str]) -> None:
+        '''设置群黑名单，替换该群原有的全部记录
+    
+        :param group_id: 群号
+        :type group_id: int
+        :param names: 被屏蔽的插件或功能名
+        :type names: Iterable[str]
+        '''
+        with self._transaction():
+            self.connection.execute('DELETE FROM group_blocks WHERE group_id = ?', (str(group_id),))
+            self.connection.executemany(
+                'INSERT INTO group_blocks (group_id, name) VALUES (?, ?)',
+                [(str(group_id), name) for name in names]
+            )
+    
+    # 关闭数据库连接
+    def close(self) -> None:
+        '''关闭数据库连接'''
+        with self.lock:
+            self.connection.close()
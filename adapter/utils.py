@@ -4,214 +4,1347 @@ WindowsSov8 Anon Bot 自用 Adapter
 # -*- coding: utf-8 -*-
 # !/usr/bin/python3
 import os
+import re
+import sys
 import json
-import inspect
+import time
+import asyncio
+import atexit
+import hashlib
+import tempfile
 import threading
 import traceback
 from io import BytesIO
 from pathlib import Path
+from random import random
+from functools import partial
+from copy import deepcopy
 from base64 import b64encode
-from typing import Union, Any
+from types import MappingProxyType, FrameType
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union, Any, Iterator, Callable, TypeVar, TextIO, Literal
 from datetime import datetime
+from queue import SimpleQueue, Empty
+
+from .logarchive import archive_before
+
+try:
+    import fcntl
+except ImportError: # 非类 Unix 系统
+    fcntl = None
 
 # 获取当前文件所在父目录
 CURRENT_DIR = os.path.dirname(os.path.dirname(__file__))
 
+_T = TypeVar('_T')
+
+# 读写锁类
+class _RWLock:
+    '''读写锁类，允许多个读者同时持有，写者独占且优先'''
+    def __init__(self) -> None:
+        self.condition = threading.Condition(threading.Lock())
+        '''条件变量'''
+        self.readers = 0
+        '''当前读者数'''
+        self.writing = False
+        '''是否有写者持有'''
+        self.waiting_writers = 0
+        '''等待中的写者数'''
+    
+    # 以读者身份持有
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        '''以读者身份持有'''
+        with self.condition:
+            while self.writing or self.waiting_writers > 0:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield None
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.condition.notify_all()
+    
+    # 以写者身份持有
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        '''以写者身份持有'''
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing or self.readers > 0:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing = True
+        try:
+            yield None
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+# 将 json 内容转换为只读视图
+def _freeze(data: Any) -> Any:
+    '''将 json 内容转换为只读视图，字典转换为 `MappingProxyType` ，列表转换为元组
+
+    :param data: json 内容
+    :type data: Any
+    :return: 只读视图
+    :rtype: Any
+    '''
+    if isinstance(data, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return tuple(_freeze(value) for value in data)
+    return data
+
+# 原子写入文件
+def atomic_write(file_name: str, write: Callable[[TextIO], Any]) -> None:
+    '''原子写入文件，写入同目录的临时文件并同步到磁盘后替换原文件，不会留下写了一半的文件
+
+    :param file_name: 要写入的文件路径
+    :type file_name: str
+    :param write: 向临时文件写入内容的函数
+    :type write: Callable[[TextIO], Any]
+    '''
+    directory = os.path.dirname(os.path.abspath(file_name))
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f'.{os.path.basename(file_name)}.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_name)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    # 同步目录项，保证替换在断电后仍然有效
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+# 文件读写线程池类
+class IOExecutor:
+    '''文件读写线程池类，异步代码中的阻塞文件读写在此执行，避免阻塞事件循环'''
+    max_workers: int = 4
+    '''最大线程数'''
+    executor: Optional[ThreadPoolExecutor] = None
+    '''线程池，首次使用时创建'''
+    lock = threading.Lock()
+    '''线程池锁'''
+    
+    # 获取线程池
+    @classmethod
+    def get(cls) -> ThreadPoolExecutor:
+        '''获取线程池，如果没有则创建一个
+
+        :return: 线程池
+        :rtype: ThreadPoolExecutor
+        '''
+        if cls.executor is None:
+            with cls.lock:
+                if cls.executor is None:
+                    cls.executor = ThreadPoolExecutor(cls.max_workers, thread_name_prefix='io')
+        return cls.executor
+    
+    # 在线程池中执行
+    @classmethod
+    async def run(cls, func: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+        '''在线程池中执行函数并等待结果
+
+        :param func: 要执行的函数
+        :type func: Callable[..., _T]
+        :return: 函数返回值
+        :rtype: _T
+        '''
+        return await asyncio.get_running_loop().run_in_executor(
+            cls.get(), partial(func, *args, **kwargs)
+        )
+
 # json 文件读写类
 class MyJson:
     '''json 文件读写类'''
-    locks: dict[str, threading.Lock] = {}
-    '''文件锁字典'''
+    locks: dict[str, _RWLock] = {}
+    '''文件读写锁字典'''
+    cache: dict[str, tuple[tuple[int, int, int], str, Any]] = {}
+    '''文件内容缓存字典：文件路径 -> ((st_mtime_ns, st_size, st_ino), 文件文本, 只读视图)'''
+    pending: dict[str, Union[dict[str, Any], list[Any]]] = {}
+    '''等待延迟写入的内容字典'''
+    timers: dict[str, threading.Timer] = {}
+    '''延迟写入计时器字典'''
+    pending_lock = threading.Lock()
+    '''延迟写入锁'''
+    process_lock: bool = False
+    '''是否启用跨进程文件锁，启用后读写时将同时持有 `fcntl` 建议锁，仅支持类 Unix 系统'''
+    lock_timeout: float = 10.0
+    '''等待跨进程文件锁的秒数，超时将抛出 `TimeoutError`'''
+    retry_delay: float = 5.0
+    '''延迟写入失败后重试的间隔秒数'''
+    
+    # 配置跨进程文件锁
+    @classmethod
+    def configure(cls, process_lock: Optional[bool]=None, lock_timeout: Optional[float]=None) -> None:
+        '''配置跨进程文件锁，多个进程读写同一批 json 文件时应在所有进程中启用
+
+        :param process_lock: 是否启用跨进程文件锁
+        :type process_lock: Optional[bool], optional
+        :param lock_timeout: 等待跨进程文件锁的秒数
+        :type lock_timeout: Optional[float], optional
+        '''
+        if process_lock and fcntl is None:
+            raise OSError('当前系统不支持 fcntl 文件锁')
+        if process_lock is not None:
+            cls.process_lock = process_lock
+        if lock_timeout is not None:
+            cls.lock_timeout = lock_timeout
+    
+    # 持有跨进程文件锁
+    @classmethod
+    @contextmanager
+    def _process_lock(cls, file_name: str, exclusive: bool) -> Iterator[None]:
+        '''持有跨进程文件锁，未启用时不做处理。
+        由于写入时文件将被原子替换，锁加在同目录下的 `.文件名.lock` 上
+
+        :param file_name: 文件路径
+        :type file_name: str
+        :param exclusive: 是否为排他锁，否则为共享锁
+        :type exclusive: bool
+        '''
+        if not cls.process_lock:
+            yield None
+            return None
+        
+        directory, base_name = os.path.split(os.path.abspath(file_name))
+        fd = os.open(os.path.join(directory, f'.{base_name}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            deadline = time.monotonic() + cls.lock_timeout
+            interval = 0.001
+            while True:
+                try:
+                    fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f'等待文件锁超时：{file_name}')
+                    time.sleep(interval)
+                    interval = min(interval * 2, 0.05)
+            yield None
+        finally:
+            os.close(fd) # 关闭时锁随之释放
+    
+    # 获取文件读写锁
+    @classmethod
+    def _get_lock(cls, file_name: str) -> _RWLock:
+        '''获取文件读写锁，如果没有则创建一个
+
+        :param file_name: 文件路径
+        :type file_name: str
+        :return: 文件读写锁
+        :rtype: _RWLock
+        '''
+        if (lock := cls.locks.get(file_name)) is None:
+            lock = cls.locks.setdefault(file_name, _RWLock())
+        return lock
+    
+    # json 文件读取
+    @classmethod
+    def _read(cls, file_name: str, empty: Union[dict[str, Any], list[Any]], readonly: bool) -> Any:
+        '''json 文件读取，文件未被修改时直接使用缓存，文件不存在时以 `empty` 创建
+
+        :param file_name: 要读取的文件路径
+        :type file_name: str
+        :param empty: 文件不存在时的内容
+        :type empty: Union[dict[str, Any], list[Any]]
+        :param readonly: 是否返回只读视图
+        :type readonly: bool
+        :return: 文件内容
+        :rtype: Any
+        '''
+        # 有等待延迟写入的内容时以其为准
+        with cls.pending_lock:
+            if file_name in cls.pending:
+                data = cls.pending[file_name]
+                return _freeze(data) if readonly else deepcopy(data)
+        
+        lock = cls._get_lock(file_name)
+        with lock.read(), cls._process_lock(file_name, False):
+            try:
+                stat = os.stat(file_name)
+            except FileNotFoundError:
+                stat = None
+            else:
+                entry = cls.cache.get(file_name)
+                if entry is None or entry[0] != (stat.st_mtime_ns, stat.st_size, stat.st_ino):
+                    with open(file_name, 'r', encoding='utf-8') as file:
+                        stat = os.fstat(file.fileno())
+                        text = file.read()
+                    entry = (
+                        (stat.st_mtime_ns, stat.st_size, stat.st_ino),
+                        text,
+                        _freeze(json.loads(text))
+                    )
+                    cls.cache[file_name] = entry
+                return entry[2] if readonly else json.loads(entry[1])
+        
+        # 文件不存在时创建
+        with lock.write(), cls._process_lock(file_name, True):
+            if not os.path.exists(file_name):
+                cls._dump(file_name, empty)
+        return _freeze(empty) if readonly else empty
     
     # json 文件读取为字典
     @classmethod
-    def read_to_dict(cls, file_name: str) -> dict[str, Any]:
+    def read_to_dict(cls, file_name: str, readonly: bool=False) -> dict[str, Any]:
         '''json 文件读取为字典
 
         :param file_name: 要读取的文件路径
         :type file_name: str
+        :param readonly: 是否返回只读视图，只读视图不会复制内容，字典为 `MappingProxyType` ，列表为元组；
+            为 `False` 时每次调用都会从缓存的文件文本重新解析出可修改的副本，耗时与直接解析文件相当，只读取内容时应传入 `True`
+        :type readonly: bool, optional
         :return: 文件内容
         :rtype: dict
         '''
-        # 判断文件是否已有线程锁对象，如果没有则创建一个
-        if not file_name in list(cls.locks.keys()):
-            cls.locks[file_name] = threading.Lock()
-            
-        # 获取对应的线程锁对象
-        lock = cls.locks[file_name]
-        # 尝试获取线程锁
-        lock.acquire()
-        
-        # 检测文件是否存在
-        if not os.path.exists(file_name):
-            data = {}
-            with open(file_name, 'w+', encoding='utf-8') as file:
-                json.dump(data, file, ensure_ascii=False, indent=4)
-            return data
-        
-        # 尝试进行文件操作
-        try:
-            with open(file_name, 'r+', encoding='utf-8') as file:
-                data = json.load(file)
-        except Exception as exception:
-            raise exception
-        else:
-            return data
-        finally:
-            # 释放线程锁
-            lock.release()
+        return cls._read(file_name, {}, readonly)
             
     # json 文件读取为列表
     @classmethod
-    def read_to_list(cls, file_name: str) -> list[Any]:
+    def read_to_list(cls, file_name: str, readonly: bool=False) -> list[Any]:
         '''json 文件读取为列表
 
         :param file_name: 要读取的文件路径
         :type file_name: str
+        :param readonly: 是否返回只读视图，只读视图不会复制内容，字典为 `MappingProxyType` ，列表为元组；
+            为 `False` 时每次调用都会从缓存的文件文本重新解析出可修改的副本，耗时与直接解析文件相当，只读取内容时应传入 `True`
+        :type readonly: bool, optional
         :return: 文件内容
         :rtype: list
         '''
-        # 判断文件是否已有线程锁对象，如果没有则创建一个
-        if not file_name in list(cls.locks.keys()):
-            cls.locks[file_name] = threading.Lock()
-            
-        # 获取对应的线程锁对象
-        lock = cls.locks[file_name]
-        # 尝试获取线程锁
-        lock.acquire()
-        
-        # 检测文件是否存在
-        if not os.path.exists(file_name):
-            data = []
-            with open(file_name, 'w+', encoding='utf-8') as file:
-                json.dump(data, file, ensure_ascii=False, indent=4)
-            return data
-        
-        # 尝试进行文件操作
-        try:
-            with open(file_name, 'r+', encoding='utf-8') as file:
-                data = json.load(file)
-        except Exception as exception:
-            raise exception
-        else:
-            return data
-        finally:
-            # 释放线程锁
-            lock.release()
+        return cls._read(file_name, [], readonly)
             
     # json 文件写入
     @classmethod
-    def write(cls, file_name: str, data: Union[dict[str, Any], list[Any]]) -> None:
-        '''json 文件写入
+    def write(
+        cls,
+        file_name: str,
+        data: Union[dict[str, Any], list[Any]],
+        delay: Optional[float]=None
+    ) -> None:
+        '''json 文件写入，写入临时文件后原子替换，不会留下写了一半的文件
 
         :param file_name: 要写入的文件路径
         :type file_name: str
         :param data: 要写入的内容
         :type data: Union[dict[str, Any], list[Any]]
+        :param delay: 延迟写入的秒数，为 `None` 时立即写入。
+            延迟写入的内容在调用时复制，之后修改 `data` 不会影响写入的内容。
+            延迟期间对同一文件的多次写入将合并为一次，只写入最后的内容，
+            写入前读取将得到最后的内容，写入失败时将保留内容并稍后重试，程序退出时将立即写入
+        :type delay: Optional[float], optional
         '''
-        # 判断文件是否已有线程锁对象，如果没有则创建一个
-        if not file_name in list(cls.locks.keys()):
-            cls.locks[file_name] = threading.Lock()
-            
-        # 获取对应的线程锁对象
-        lock = cls.locks[file_name]
-        # 尝试获取线程锁
-        lock.acquire()
+        if delay is not None: # 延迟写入
+            data = deepcopy(data)
+            with cls.pending_lock:
+                cls.pending[file_name] = data
+                cls._schedule(file_name, delay)
+            return None
         
-        # 尝试进行文件操作
+        with cls._get_lock(file_name).write(), cls._process_lock(file_name, True):
+            with cls.pending_lock:
+                pending = cls.pending.get(file_name)
+            cls._dump(file_name, data)
+            cls.cache.pop(file_name, None)
+            # 写入成功后取消等待中的延迟写入
+            cls._clear_pending(file_name, pending)
+    
+    # json 文件原地修改
+    @classmethod
+    def update(
+        cls,
+        file_name: str,
+        updater: Callable[[Any], None],
+        empty: Union[dict[str, Any], list[Any], None]=None
+    ) -> None:
+        '''json 文件原地修改，读取、修改与写入期间始终持有排他锁，
+        启用跨进程文件锁时多个进程同时修改同一文件也不会丢失修改
+
+        :param file_name: 要修改的文件路径
+        :type file_name: str
+        :param updater: 修改函数，将直接修改传入的文件内容
+        :type updater: Callable[[Any], None]
+        :param empty: 文件不存在时的内容，为 `None` 时为空字典
+        :type empty: Union[dict[str, Any], list[Any], None], optional
+        '''
+        with cls._get_lock(file_name).write(), cls._process_lock(file_name, True):
+            # 有等待延迟写入的内容时以其为准，修改副本以免失败时破坏等待写入的内容
+            with cls.pending_lock:
+                pending = cls.pending.get(file_name)
+            if pending is not None:
+                data = deepcopy(pending)
+            elif os.path.exists(file_name):
+                with open(file_name, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+            else:
+                data = {} if empty is None else empty
+            updater(data)
+            cls._dump(file_name, data)
+            cls.cache.pop(file_name, None)
+            # 写入成功后取消等待中的延迟写入
+            cls._clear_pending(file_name, pending)
+    
+    # 异步 json 文件读取为字典
+    @classmethod
+    async def aread_to_dict(cls, file_name: str, readonly: bool=False) -> dict[str, Any]:
+        '''异步 json 文件读取为字典，在文件读写线程池中读取，不阻塞事件循环
+
+        :param file_name: 要读取的文件路径
+        :type file_name: str
+        :param readonly: 是否返回只读视图，见 `read_to_dict`
+        :type readonly: bool, optional
+        :return: 文件内容
+        :rtype: dict
+        '''
+        return await IOExecutor.run(cls.read_to_dict, file_name, readonly)
+    
+    # 异步 json 文件读取为列表
+    @classmethod
+    async def aread_to_list(cls, file_name: str, readonly: bool=False) -> list[Any]:
+        '''异步 json 文件读取为列表，在文件读写线程池中读取，不阻塞事件循环
+
+        :param file_name: 要读取的文件路径
+        :type file_name: str
+        :param readonly: 是否返回只读视图，见 `read_to_list`
+        :type readonly: bool, optional
+        :return: 文件内容
+        :rtype: list
+        '''
+        return await IOExecutor.run(cls.read_to_list, file_name, readonly)
+    
+    # 异步 json 文件写入
+    @classmethod
+    async def awrite(
+        cls,
+        file_name: str,
+        data: Union[dict[str, Any], list[Any]],
+        delay: Optional[float]=None
+    ) -> None:
+        '''异步 json 文件写入，在文件读写线程池中写入，不阻塞事件循环
+
+        :param file_name: 要写入的文件路径
+        :type file_name: str
+        :param data: 要写入的内容，写入完成前不应修改
+        :type data: Union[dict[str, Any], list[Any]]
+        :param delay: 延迟写入的秒数，为 `None` 时立即写入
+        :type delay: Optional[float], optional
+        '''
+        await IOExecutor.run(cls.write, file_name, data, delay)
+    
+    # 异步 json 文件原地修改
+    @classmethod
+    async def aupdate(
+        cls,
+        file_name: str,
+        updater: Callable[[Any], None],
+        empty: Union[dict[str, Any], list[Any], None]=None
+    ) -> None:
+        '''异步 json 文件原地修改，在文件读写线程池中执行，不阻塞事件循环。
+        `updater` 也将在线程池中执行
+
+        :param file_name: 要修改的文件路径
+        :type file_name: str
+        :param updater: 修改函数，将直接修改传入的文件内容
+        :type updater: Callable[[Any], None]
+        :param empty: 文件不存在时的内容，为 `None` 时为空字典
+        :type empty: Union[dict[str, Any], list[Any], None], optional
+        '''
+        await IOExecutor.run(cls.update, file_name, updater, empty)
+    
+    # 立即写入等待延迟写入的内容
+    @classmethod
+    def flush(cls, file_name: Optional[str]=None) -> None:
+        '''立即写入等待延迟写入的内容，写入失败的内容将被保留并在 `retry_delay` 秒后重试
+
+        :param file_name: 要写入的文件路径，为 `None` 时写入所有文件
+        :type file_name: Optional[str], optional
+        :raises Exception: 写入失败时抛出第一个异常，其余文件仍会写入
+        '''
+        if file_name is None:
+            with cls.pending_lock:
+                file_names = list(cls.pending.keys())
+        else:
+            file_names = [file_name]
+        
+        error: Optional[Exception] = None
+        for name in file_names:
+            with cls._get_lock(name).write(), cls._process_lock(name, True):
+                with cls.pending_lock:
+                    if (timer := cls.timers.pop(name, None)) is not None:
+                        timer.cancel()
+                    if not name in cls.pending:
+                        continue
+                    data = cls.pending[name]
+                try:
+                    cls._dump(name, data)
+                except Exception as exception:
+                    with cls.pending_lock:
+                        cls._schedule(name, cls.retry_delay)
+                    error = error or exception
+                    continue
+                cls.cache.pop(name, None)
+                cls._clear_pending(name, data)
+        if error is not None:
+            raise error
+    
+    # 计划延迟写入
+    @classmethod
+    def _schedule(cls, file_name: str, delay: float) -> None:
+        '''计划延迟写入，已有计时器时不做处理，调用时需持有 `pending_lock`
+
+        :param file_name: 要写入的文件路径
+        :type file_name: str
+        :param delay: 延迟秒数
+        :type delay: float
+        '''
+        if not file_name in cls.timers:
+            timer = threading.Timer(delay, cls._delayed_flush, (file_name,))
+            timer.daemon = True
+            cls.timers[file_name] = timer
+            timer.start()
+    
+    # 延迟写入计时器回调
+    @classmethod
+    def _delayed_flush(cls, file_name: str) -> None:
+        '''延迟写入计时器回调，计时器线程中的异常不会被调用者看到，因此在此输出
+
+        :param file_name: 要写入的文件路径
+        :type file_name: str
+        '''
         try:
-            with open(file_name, 'w+', encoding='utf-8') as file:
-                json.dump(data, file, ensure_ascii=False, indent=4)
+            cls.flush(file_name)
         except Exception as exception:
-            raise exception
-        else:
-            return None
-        finally:
-            # 释放线程锁
-            lock.release()
+            print(f'延迟写入 {file_name} 时出现错误：{exception}', file=sys.stderr)
+    
+    # 清除已写入的延迟写入内容
+    @classmethod
+    def _clear_pending(cls, file_name: str, data: Any) -> None:
+        '''清除已写入的延迟写入内容，期间又有新的延迟写入时保留
+
+        :param file_name: 文件路径
+        :type file_name: str
+        :param data: 已写入的延迟写入内容
+        :type data: Any
+        '''
+        with cls.pending_lock:
+            if data is not None and cls.pending.get(file_name) is data:
+                del cls.pending[file_name]
+                if (timer := cls.timers.pop(file_name, None)) is not None:
+                    timer.cancel()
+    
+    # 原子写入 json 文件
+    @staticmethod
+    def _dump(file_name: str, data: Union[dict[str, Any], list[Any]]) -> None:
+        '''原子写入 json 文件，调用时需以写者身份持有文件读写锁
+
+        :param file_name: 要写入的文件路径
+        :type file_name: str
+        :param data: 要写入的内容
+        :type data: Union[dict[str, Any], list[Any]]
+        '''
+        atomic_write(file_name, partial(json.dump, data, ensure_ascii=False, indent=4))
+
+# 程序退出时写入所有等待延迟写入的内容
+atexit.register(MyJson.flush)
 
 # 日志记录类
 class Logging:
-    '''日志记录类'''
+    '''日志记录类
+
+    日志由后台写入线程写入，调用者只需将日志放入队列。写入线程保持当天日志文件打开，
+    积累到一定大小或间隔一定时间后批量写入，跨日时切换到新的日志文件，程序退出时写入队列中剩余的日志。
+
+    日志分为 `DEBUG` 、 `INFO` 、 `WARN` 、 `ERROR` 四个等级，低于阈值的日志将被丢弃，阈值可按模块设置；
+    大量重复的日志可指定类别（如 `message` 、 `heartbeat` 、 `api` ）并按类别抽样记录。
+    '''
+    DEBUG = 10
+    '''调试等级'''
+    INFO = 20
+    '''信息等级'''
+    WARN = 30
+    '''警告等级'''
+    ERROR = 40
+    '''错误等级'''
+    LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARN: 'WARN', ERROR: 'ERROR'}
+    '''等级名称字典'''
     lock = threading.Lock() # 创建线程锁对象
+    queue: SimpleQueue = SimpleQueue()
+    '''日志队列，元素为 (日志文件名, 完整日志内容) ，或用于等待写入完成的 `threading.Event` ，或表示停止的 `None`'''
+    writer: Optional[threading.Thread] = None
+    '''后台写入线程'''
+    flush_interval: float = 1.0
+    '''写入文件的最大间隔秒数'''
+    flush_bytes: int = 64 * 1024
+    '''积累到该字节数时立即写入文件'''
+    level: int = INFO
+    '''默认等级阈值'''
+    module_levels: dict[str, int] = {}
+    '''各模块等级阈值：模块名 -> 等级阈值，同样作用于子模块'''
+    console: bool = True
+    '''是否同时在控制台输出需要回显的日志'''
+    sample_rates: dict[str, float] = {}
+    '''各类别抽样比例：类别 -> 记录比例，未设置的类别全部记录'''
+    level_cache: dict[str, int] = {}
+    '''模块等级阈值缓存'''
+    log_format: Literal['text', 'json'] = 'text'
+    '''日志格式， `text` 为文本日志 `日期.log` ， `json` 为 json 行日志 `日期.jsonl`'''
+    compress: bool = True
+    '''是否在跨日后压缩 json 行日志并建立索引，见 `adapter.logarchive`'''
+    archive_lock = threading.Lock()
+    '''日志压缩锁'''
+    
+    # 配置日志记录
+    @classmethod
+    def configure(
+        cls,
+        level: Union[int, str, None]=None,
+        module_levels: Optional[dict[str, Union[int, str]]]=None,
+        console: Optional[bool]=None,
+        sample_rates: Optional[dict[str, float]]=None,
+        log_format: Optional[Literal['text', 'json']]=None,
+        compress: Optional[bool]=None
+    ) -> None:
+        '''配置日志记录，等级可为数值或等级名称
+
+        :param level: 默认等级阈值
+        :type level: Union[int, str, None], optional
+        :param module_levels: 各模块等级阈值，如 `{'adapter.adapter': 'WARN'}`
+        :type module_levels: Optional[dict[str, Union[int, str]]], optional
+        :param console: 是否同时在控制台输出需要回显的日志
+        :type console: Optional[bool], optional
+        :param sample_rates: 各类别抽样比例，如 `{'heartbeat': 0, 'api': 0.1}`
+        :type sample_rates: Optional[dict[str, float]], optional
+        :param log_format: 日志格式， `text` 或 `json`
+        :type log_format: Optional[Literal['text', 'json']], optional
+        :param compress: 是否在跨日后压缩 json 行日志并建立索引
+        :type compress: Optional[bool], optional
+        '''
+        if level is not None:
+            cls.level = cls._to_level(level)
+        if module_levels is not None:
+            cls.module_levels = {name: cls._to_level(value) for name, value in module_levels.items()}
+        if console is not None:
+            cls.console = console
+        if sample_rates is not None:
+            cls.sample_rates = dict(sample_rates)
+        if log_format is not None:
+            if not log_format in ('text', 'json'):
+                raise ValueError(f'不合法的日志格式：{log_format}')
+            cls.log_format = log_format
+        if compress is not None:
+            cls.compress = compress
+        cls.level_cache = {}
+    
+    # 调试日志记录方法
+    @classmethod
+    def debug(cls, info: Any, category: Optional[str]=None, echo: bool=False, **fields: Any) -> None:
+        '''调试日志记录方法
+
+        :param info: 记录的日志内容，非字符串对象只在需要记录时转换为字符串
+        :type info: Any
+        :param category: 日志类别，用于抽样
+        :type category: Optional[str], optional
+        :param echo: 是否同时在控制台输出
+        :type echo: bool, optional
+        :param fields: 结构化字段，如 `group_id` 、 `user_id` 、 `message_id` 、 `latency` ，只记录于 json 行日志
+        :type fields: Any
+        '''
+        cls._log(cls.DEBUG, sys._getframe(1), info, category, echo, fields)
     
     # 输出日志记录方法
     @classmethod
-    def info(cls, info: str) -> None:
+    def info(cls, info: Any, category: Optional[str]=None, echo: bool=False, **fields: Any) -> None:
         '''输出日志记录方法
 
+        :param info: 记录的日志内容，非字符串对象只在需要记录时转换为字符串
+        :type info: Any
+        :param category: 日志类别，用于抽样
+        :type category: Optional[str], optional
+        :param echo: 是否同时在控制台输出
+        :type echo: bool, optional
+        :param fields: 结构化字段，如 `group_id` 、 `user_id` 、 `message_id` 、 `latency` ，只记录于 json 行日志
+        :type fields: Any
+        '''
+        cls._log(cls.INFO, sys._getframe(1), info, category, echo, fields)
+    
+    # 警告日志记录方法
+    @classmethod
+    def warn(cls, info: Any, category: Optional[str]=None, echo: bool=False, **fields: Any) -> None:
+        '''警告日志记录方法
+
+        :param info: 记录的日志内容，非字符串对象只在需要记录时转换为字符串
+        :type info: Any
+        :param category: 日志类别，用于抽样
+        :type category: Optional[str], optional
+        :param echo: 是否同时在控制台输出
+        :type echo: bool, optional
+        :param fields: 结构化字段，如 `group_id` 、 `user_id` 、 `message_id` 、 `latency` ，只记录于 json 行日志
+        :type fields: Any
+        '''
+        cls._log(cls.WARN, sys._getframe(1), info, category, echo, fields)
+        
+    # 错误信息日志记录方法
+    @classmethod
+    def error(cls, exception: Exception) -> None:
+        '''输出日志记录方法
+
+        :param exception: 记录的错误信息
+        :type exception: Exception
+        '''
+        frame = sys._getframe(1)
+        if cls.enabled(cls.ERROR, cls._get_name(frame)):
+            cls._write(*cls._build_error(frame, exception))
+    
+    # 异步输出日志记录方法
+    @classmethod
+    async def ainfo(cls, info: Any, category: Optional[str]=None, echo: bool=False, **fields: Any) -> None:
+        '''异步输出日志记录方法，日志只放入写入队列，不阻塞事件循环
+
+        :param info: 记录的日志内容，非字符串对象只在需要记录时转换为字符串
+        :type info: Any
+        :param category: 日志类别，用于抽样
+        :type category: Optional[str], optional
+        :param echo: 是否同时在控制台输出
+        :type echo: bool, optional
+        :param fields: 结构化字段，如 `group_id` 、 `user_id` 、 `message_id` 、 `latency` ，只记录于 json 行日志
+        :type fields: Any
+        '''
+        cls._log(cls.INFO, sys._getframe(1), info, category, echo, fields)
+    
+    # 异步错误信息日志记录方法
+    @classmethod
+    async def aerror(cls, exception: Exception) -> None:
+        '''异步输出错误信息日志记录方法，日志只放入写入队列，不阻塞事件循环
+
+        :param exception: 记录的错误信息
+        :type exception: Exception
+        '''
+        frame = sys._getframe(1)
+        if cls.enabled(cls.ERROR, cls._get_name(frame)):
+            cls._write(*cls._build_error(frame, exception))
+    
+    # 判断日志是否需要记录
+    @classmethod
+    def enabled(cls, level: int, name: str, category: Optional[str]=None) -> bool:
+        '''判断日志是否需要记录，指定类别时同时进行抽样
+
+        :param level: 日志等级
+        :type level: int
+        :param name: 模块名称
+        :type name: str
+        :param category: 日志类别
+        :type category: Optional[str], optional
+        :return: 是否需要记录
+        :rtype: bool
+        '''
+        if (threshold := cls.level_cache.get(name)) is None:
+            threshold = cls.level
+            # 以最长匹配的模块名为准
+            matched = ''
+            for module_name, module_level in cls.module_levels.items():
+                if (name == module_name or name.startswith(module_name + '.')) and \
+                    len(module_name) > len(matched):
+                    matched, threshold = module_name, module_level
+            cls.level_cache[name] = threshold
+        if level < threshold:
+            return False
+        if category is not None:
+            rate = cls.sample_rates.get(category, 1.0)
+            if rate < 1.0 and random() >= rate:
+                return False
+        return True
+    
+    # 记录日志
+    @classmethod
+    def _log(
+        cls,
+        level: int,
+        frame: FrameType,
+        info: Any,
+        category: Optional[str],
+        echo: bool,
+        fields: dict[str, Any]
+    ) -> None:
+        '''记录日志
+
+        :param level: 日志等级
+        :type level: int
+        :param frame: 调用者的栈帧
+        :type frame: FrameType
+        :param info: 记录的日志内容
+        :type info: Any
+        :param category: 日志类别
+        :type category: Optional[str]
+        :param echo: 是否同时在控制台输出
+        :type echo: bool
+        :param fields: 结构化字段
+        :type fields: dict[str, Any]
+        '''
+        name = cls._get_name(frame)
+        if not cls.enabled(level, name, category):
+            return None
+        info = info if isinstance(info, str) else str(info)
+        if echo and cls.console:
+            print(info)
+        cls._write(*cls._build_info(level, name, info, fields))
+    
+    # 转换等级
+    @classmethod
+    def _to_level(cls, level: Union[int, str]) -> int:
+        '''转换等级
+
+        :param level: 等级数值或等级名称
+        :type level: Union[int, str]
+        :return: 等级数值
+        :rtype: int
+        '''
+        if isinstance(level, int):
+            return level
+        for value, level_name in cls.LEVEL_NAMES.items():
+            if level_name == level.upper():
+                return value
+        raise ValueError(f'不合法的日志等级：{level}')
+    
+    # 获取引用模块名称
+    @staticmethod
+    def _get_name(frame: FrameType) -> str:
+        '''获取引用模块名称，直接读取栈帧全局变量中的 `__name__` ，不构建整个调用栈
+
+        :param frame: 调用者的栈帧
+        :type frame: FrameType
+        :return: 模块名称
+        :rtype: str
+        '''
+        return frame.f_globals.get('__name__', '')
+    
+    # 生成日志内容
+    @classmethod
+    def _build_info(
+        cls,
+        level: int,
+        name: str,
+        info: str,
+        fields: Optional[dict[str, Any]]=None
+    ) -> tuple[str, str]:
+        '''生成日志内容
+
+        :param level: 日志等级
+        :type level: int
+        :param name: 模块名称
+        :type name: str
         :param info: 记录的日志内容
         :type info: str
+        :param fields: 结构化字段，值为 `None` 的字段不记录
+        :type fields: Optional[dict[str, Any]], optional
+        :return: (日志文件名, 完整日志内容)
+        :rtype: tuple[str, str]
         '''
         # 获取当前日期
         now = datetime.now()
-        date_now = now.strftime('%Y-%m-%d')
-        # 获取引用模块名称
-        module = inspect.getmodule(inspect.stack()[1][0])
-        if not module is None:
-            name = module.__name__
-        else:
-            name = ''
-        
+        time_now = now.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
+        level_name = cls.LEVEL_NAMES.get(level, str(level))
+        if cls.log_format == 'json': # json 行日志
+            record = {'time': time_now, 'level': level_name, 'module': name, 'message': info}
+            if fields:
+                record.update((key, value) for key, value in fields.items() if value is not None)
+            return f'{time_now[:10]}.jsonl', json.dumps(record, ensure_ascii=False) + '\n'
         # 拼接完整日志内容
-        log_message = '[{time}] INFO in {name}: {info}\n'.format(
-            time = now.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3],
+        log_message = '[{time}] {level} in {name}: {info}\n'.format(
+            time = time_now,
+            level = level_name,
             name = name,
             info = info
         )
-        
-        # 获取线程锁
-        cls.lock.acquire()
-        # 检测日志路径是否存在
-        if not os.path.exists(CURRENT_DIR + '/log'):
-            os.mkdir(CURRENT_DIR + '/log')
-        # 创建并写入日志文件
-        with open(CURRENT_DIR + f'/log/{date_now}.log', 'a+', encoding='utf-8') as log_file:
-            log_file.write(log_message)
-        # 释放线程锁
-        cls.lock.release()
-        
-    # 错误信息日志记录方法
+        return f'{time_now[:10]}.log', log_message
+    
+    # 生成错误信息日志内容
     @classmethod
-    def error(cls, exception: Exception) -> None:
-        '''输出日志记录方法
+    def _build_error(cls, frame: FrameType, exception: Exception) -> tuple[str, str]:
+        '''生成错误信息日志内容
 
+        :param frame: 调用者的栈帧
+        :type frame: FrameType
         :param exception: 记录的错误信息
         :type exception: Exception
+        :return: (日志文件名, 完整日志内容)
+        :rtype: tuple[str, str]
         '''
-        # 获取当前日期
-        now = datetime.now()
-        date_now = now.strftime('%Y-%m-%d')
-        # 获取引用模块名称
-        module = inspect.getmodule(inspect.stack()[1][0])
-        if not module is None:
-            name = module.__name__
-        else:
-            name = ''
-            
         # 获取错误追踪信息
         error = '\n' + ''.join(traceback.format_exception(
             type(exception),
             exception,
             exception.__traceback__
             ))
+        if cls.log_format == 'json': # json 行日志
+            return cls._build_info(cls.ERROR, cls._get_name(frame), error[1:])
+        # 获取当前日期
+        now = datetime.now()
         # 拼接完整日志内容
         log_message = '[{time}] ERROR in {name}: {error}\n'.format(
             time = now.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3],
-            name = name,
+            name = cls._get_name(frame),
             error = error
             )
+        return now.strftime('%Y-%m-%d') + '.log', log_message
+    
+    # 将日志放入写入队列
+    @classmethod
+    def _write(cls, file_name: str, log_message: str) -> None:
+        '''将日志放入写入队列，写入线程未启动时启动
+
+        :param file_name: 日志文件名
+        :type file_name: str
+        :param log_message: 完整日志内容
+        :type log_message: str
+        '''
+        if cls.writer is None:
+            cls._start()
+        cls.queue.put((file_name, log_message))
+    
+    # 启动后台写入线程
+    @classmethod
+    def _start(cls) -> None:
+        '''启动后台写入线程'''
+        with cls.lock:
+            if cls.writer is None:
+                writer = threading.Thread(target=cls._run, name='logging', daemon=True)
+                writer.start()
+                cls.writer = writer
+    
+    # 后台写入线程
+    @classmethod
+    def _run(cls) -> None:
+        '''后台写入线程，从队列中取出日志批量写入当天的日志文件'''
+        log_file: Optional[TextIO] = None
+        current_name = ''
+        buffered = 0
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            # 等待日志，超时时检查是否需要写入
+            try:
+                items = [cls.queue.get(timeout=cls.flush_interval)]
+            except Empty:
+                items = []
+            # 一次取出队列中的所有日志
+            while True:
+                try:
+                    items.append(cls.queue.get_nowait())
+                except Empty:
+                    break
+            
+            waiters: list[threading.Event] = []
+            for item in items:
+                if item is None: # 停止
+                    running = False
+                    continue
+                if isinstance(item, threading.Event): # 等待写入完成
+                    waiters.append(item)
+                    continue
+                file_name, log_message = item
+                # 跨日前产生而跨日后才到达的日志写入当前文件，已跨日的日志文件可能已被压缩
+                if current_name and file_name[:10] < current_name[:10]:
+                    file_name = current_name[:10] + file_name[10:]
+                try:
+                    if file_name != current_name: # 跨日或切换格式时切换日志文件
+                        if log_file is not None:
+                            log_file.close()
+                        os.makedirs(CURRENT_DIR + '/log', exist_ok=True)
+                        log_file = open(CURRENT_DIR + f'/log/{file_name}', 'a', encoding='utf-8')
+                        current_name = file_name
+                        if cls.compress: # 压缩此前的 json 行日志
+                            threading.Thread(
+                                target=cls._archive, args=(file_name[:10],), name='log-archive', daemon=True
+                            ).start()
+                    log_file.write(log_message)
+                    buffered += len(log_message)
+                except Exception as exception:
+                    print(f'写入日志时出现错误：{exception}', file=sys.stderr)
+            
+            # 积累足够多的日志、间隔足够久或有等待者时写入文件
+            if log_file is not None and buffered > 0 and (
+                waiters or not running or buffered >= cls.flush_bytes
+                or time.monotonic() - last_flush >= cls.flush_interval
+            ):
+                try:
+                    log_file.flush()
+                except Exception as exception:
+                    print(f'写入日志时出现错误：{exception}', file=sys.stderr)
+                buffered = 0
+                last_flush = time.monotonic()
+            for waiter in waiters:
+                waiter.set()
+        
+        if log_file is not None:
+            log_file.close()
+    
+    # 压缩早于指定日期的 json 行日志
+    @classmethod
+    def _archive(cls, date: str) -> None:
+        '''压缩早于指定日期的 json 行日志
+
+        :param date: 日期，格式为 `YYYY-MM-DD`
+        :type date: str
+        '''
+        with cls.archive_lock:
+            try:
+                archive_before(date, CURRENT_DIR + '/log')
+            except Exception as exception:
+                print(f'压缩日志时出现错误：{exception}', file=sys.stderr)
+    
+    # 等待队列中的日志写入完成
+    @classmethod
+    def flush(cls, timeout: Optional[float]=None) -> bool:
+        '''等待此前放入队列的日志全部写入文件
+
+        :param timeout: 等待秒数，为 `None` 时一直等待
+        :type timeout: Optional[float], optional
+        :return: 是否在超时前写入完成
+        :rtype: bool
+        '''
+        if cls.writer is None or not cls.writer.is_alive():
+            return True
+        waiter = threading.Event()
+        cls.queue.put(waiter)
+        return waiter.wait(timeout)
+    
+    # 停止后台写入线程
+    @classmethod
+    def shutdown(cls, timeout: Optional[float]=5.0) -> None:
+        '''写入队列中剩余的日志并停止后台写入线程，之后的日志将重新启动写入线程
+
+        :param timeout: 等待秒数，为 `None` 时一直等待
+        :type timeout: Optional[float], optional
+        '''
+        with cls.lock:
+            writer, cls.writer = cls.writer, None
+            if writer is None:
+                return None
+            cls.queue.put(None)
+        writer.join(timeout)
+
+# 程序退出时写入剩余日志
+atexit.register(Logging.shutdown)
+
+# 本地媒体缓存类
+class MediaSpool:
+    '''本地媒体缓存类
+
+    启用后，超过大小阈值的二进制媒体将以内容哈希为文件名写入缓存目录（建议使用 tmpfs ，如 `/dev/shm` ），
+    并以 `file://` 形式发送，而不再内联为 `base64://` 字符串。缓存目录须能被 go-cqhttp 直接读取。
+    '''
+    directory: Optional[str] = None
+    '''缓存目录，为 `None` 时不启用'''
+    threshold: int = 256 * 1024
+    '''使用缓存的最小字节数，小于该值的数据仍内联发送'''
+    max_bytes: int = 512 * 1024 * 1024
+    '''缓存总大小上限'''
+    max_age: float = 3600
+    '''缓存文件在最后一次使用后的保留秒数'''
+    grace: float = 60
+    '''最后一次使用后的保护秒数，在此期间的文件不会因总大小超限而被清理'''
+    entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+    '''缓存条目，按最近使用排序：内容哈希 -> (字节数, 最后使用时间)'''
+    total: int = 0
+    '''缓存总字节数'''
+    lock = threading.Lock()
+    '''缓存锁'''
+    
+    # 配置并启用缓存
+    @classmethod
+    def configure(
+        cls,
+        directory: Union[str, Path],
+        threshold: Optional[int]=None,
+        max_bytes: Optional[int]=None,
+        max_age: Optional[float]=None
+    ) -> None:
+        '''配置并启用缓存，目录中已有的缓存文件将被重新纳入管理
+
+        :param directory: 缓存目录
+        :type directory: Union[str, Path]
+        :param threshold: 使用缓存的最小字节数
+        :type threshold: Optional[int], optional
+        :param max_bytes: 缓存总大小上限
+        :type max_bytes: Optional[int], optional
+        :param max_age: 缓存文件在最后一次使用后的保留秒数
+        :type max_age: Optional[float], optional
+        '''
+        with cls.lock:
+            cls.directory = os.path.abspath(directory)
+            if threshold is not None:
+                cls.threshold = threshold
+            if max_bytes is not None:
+                cls.max_bytes = max_bytes
+            if max_age is not None:
+                cls.max_age = max_age
+            os.makedirs(cls.directory, exist_ok=True)
+            
+            # 重新纳入已有的缓存文件
+            existing: list[tuple[float, str, int]] = []
+            for entry in os.scandir(cls.directory):
+                if entry.is_file() and len(entry.name) == 64: # sha256 十六进制
+                    stat = entry.stat()
+                    existing.append((stat.st_mtime, entry.name, stat.st_size))
+            cls.entries = OrderedDict(
+                (digest, (size, mtime)) for mtime, digest, size in sorted(existing)
+            )
+            cls.total = sum(size for _, _, size in existing)
+            cls._sweep(time.time())
+    
+    # 判断数据是否应写入缓存
+    @classmethod
+    def accepts(cls, data: bytes) -> bool:
+        '''判断数据是否应写入缓存
+
+        :param data: 二进制数据
+        :type data: bytes
+        :return: 是否应写入缓存
+        :rtype: bool
+        '''
+        return cls.directory is not None and len(data) >= cls.threshold
+    
+    # 写入缓存
+    @classmethod
+    def store(cls, data: bytes) -> str:
+        '''写入缓存，相同内容只会写入一次
+
+        :param data: 二进制数据
+        :type data: bytes
+        :return: 缓存文件的 `file://` URI
+        :rtype: str
+        '''
+        if cls.directory is None:
+            raise RuntimeError('媒体缓存未启用')
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(cls.directory, digest)
+        now = time.time()
+        
+        with cls.lock:
+            if digest in cls.entries and os.path.exists(path): # 已缓存
+                cls.entries.move_to_end(digest)
+                cls.entries[digest] = (len(data), now)
+                os.utime(path, (now, now))
+            else:
+                # 写入临时文件后原子替换，避免发送未写完的文件
+                fd, temp_path = tempfile.mkstemp(dir=cls.directory, prefix='.spool-')
+                try:
+                    with os.fdopen(fd, 'wb') as file:
+                        file.write(data)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+                if digest in cls.entries: # 文件已被外部删除
+                    cls.total -= cls.entries.pop(digest)[0]
+                cls.entries[digest] = (len(data), now)
+                cls.total += len(data)
+            cls._sweep(now)
         
-        # 获取线程锁
-        cls.lock.acquire()
-        # 检测日志路径是否存在
-        if not os.path.exists(CURRENT_DIR + '/log'):
-            os.mkdir(CURRENT_DIR + '/log')
-        # 创建并写入日志文件
-        with open(CURRENT_DIR + f'/log/{date_now}.log', 'a+', encoding='utf-8') as log_file:
-            log_file.write(log_message)
-        # 释放线程锁
-        cls.lock.release()
+        return Path(path).as_uri()
+    
+    # 清理缓存
+    @classmethod
+    def sweep(cls) -> None:
+        '''清理过期缓存，并在总大小超限时按最近最少使用清理'''
+        with cls.lock:
+            cls._sweep(time.time())
+    
+    # 清理缓存（需持有锁）
+    @classmethod
+    def _sweep(cls, now: float) -> None:
+        '''清理缓存，调用时需持有锁
+
+        :param now: 当前时间戳
+        :type now: float
+        '''
+        while cls.entries:
+            digest, (size, last_used) = next(iter(cls.entries.items()))
+            if now - last_used > cls.max_age:
+                pass # 已过期
+            elif cls.total > cls.max_bytes and now - last_used > cls.grace:
+                pass # 总大小超限
+            else:
+                break
+            del cls.entries[digest]
+            cls.total -= size
+            try:
+                os.remove(os.path.join(cls.directory, digest))
+            except FileNotFoundError:
+                pass
+
+# 发送图片优化类
+class ImageOptimizer:
+    '''发送图片优化类
+
+    启用后，通过 `MessageSegment.image` 发送的二进制图片在超过像素限制时将被缩小，
+    不含透明通道的图片将被重新编码为 JPEG 或 WebP 。优化结果以内容哈希缓存。
+    需要安装 Pillow 。
+    '''
+    enabled: bool = False
+    '''是否启用'''
+    max_width: int = 2048
+    '''最大宽度'''
+    max_height: int = 8192
+    '''最大高度'''
+    format: str = 'JPEG'
+    '''不含透明通道的图片的重新编码格式， `JPEG` 或 `WEBP`'''
+    quality: int = 85
+    '''重新编码质量'''
+    cache_size: int = 64
+    '''优化结果缓存条目数'''
+    cache: OrderedDict[str, Optional[bytes]] = OrderedDict()
+    '''优化结果缓存：内容哈希 -> 优化后的数据，无需优化时为 `None`'''
+    stats: dict[str, Union[int, float]] = {
+        'images': 0,
+        'optimized': 0,
+        'cache_hits': 0,
+        'bytes_in': 0,
+        'bytes_out': 0,
+        'bytes_saved': 0,
+        'seconds': 0.0
+    }
+    '''统计信息'''
+    lock = threading.Lock()
+    '''缓存与统计锁'''
+    
+    # 配置并启用优化
+    @classmethod
+    def configure(
+        cls,
+        max_width: Optional[int]=None,
+        max_height: Optional[int]=None,
+        format: Optional[str]=None,
+        quality: Optional[int]=None,
+        enabled: bool=True
+    ) -> None:
+        '''配置并启用优化
+
+        :param max_width: 最大宽度
+        :type max_width: Optional[int], optional
+        :param max_height: 最大高度
+        :type max_height: Optional[int], optional
+        :param format: 重新编码格式， `JPEG` 或 `WEBP`
+        :type format: Optional[str], optional
+        :param quality: 重新编码质量
+        :type quality: Optional[int], optional
+        :param enabled: 是否启用
+        :type enabled: bool, optional
+        '''
+        with cls.lock:
+            if max_width is not None:
+                cls.max_width = max_width
+            if max_height is not None:
+                cls.max_height = max_height
+            if format is not None:
+                cls.format = format.upper()
+            if quality is not None:
+                cls.quality = quality
+            cls.enabled = enabled
+            cls.cache.clear()
+    
+    # 优化图片
+    @classmethod
+    def optimize(cls, data: bytes) -> bytes:
+        '''优化图片，无法优化或优化后更大时返回原数据
+
+        :param data: 图片数据
+        :type data: bytes
+        :return: 优化后的图片数据
+        :rtype: bytes
+        '''
+        begin = time.perf_counter()
+        digest = hashlib.sha256(data).hexdigest()
+        with cls.lock:
+            hit = digest in cls.cache
+            if hit:
+                cls.cache.move_to_end(digest)
+                result = cls.cache[digest]
+        
+        if not hit:
+            try:
+                result = cls._optimize(data)
+            except Exception as exception:
+                Logging.warn(f'图片优化失败：{exception}')
+                result = None
+        
+        output = data if result is None else result
+        with cls.lock:
+            if not hit:
+                cls.cache[digest] = result
+                while len(cls.cache) > cls.cache_size:
+                    cls.cache.popitem(last=False)
+            cls.stats['images'] += 1
+            cls.stats['cache_hits'] += hit
+            cls.stats['optimized'] += result is not None
+            cls.stats['bytes_in'] += len(data)
+            cls.stats['bytes_out'] += len(output)
+            cls.stats['bytes_saved'] += len(data) - len(output)
+            cls.stats['seconds'] += time.perf_counter() - begin
+        return output
+    
+    # 优化图片（不经缓存）
+    @classmethod
+    def _optimize(cls, data: bytes) -> Optional[bytes]:
+        '''优化图片（不经缓存）
+
+        :param data: 图片数据
+        :type data: bytes
+        :return: 优化后的图片数据，无需优化时返回 `None`
+        :rtype: Optional[bytes]
+        '''
+        from PIL import Image
+        
+        image = Image.open(BytesIO(data))
+        if getattr(image, 'is_animated', False): # 动图不做处理
+            return None
+        
+        resized = image.width > cls.max_width or image.height > cls.max_height
+        if resized:
+            image.thumbnail((cls.max_width, cls.max_height), Image.LANCZOS)
+        
+        # 判断是否含有透明部分
+        if image.mode == 'P' and 'transparency' in image.info:
+            image = image.convert('RGBA')
+        if image.mode in ('RGBA', 'LA', 'PA'):
+            transparent = image.getchannel('A').getextrema()[0] < 255
+        else:
+            transparent = False
+        
+        buffer = BytesIO()
+        if transparent: # 含有透明部分时只在缩小后重新编码为 PNG
+            if not resized:
+                return None
+            image.save(buffer, format='PNG', optimize=True)
+        else:
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(buffer, format=cls.format, quality=cls.quality)
+        
+        output = buffer.getvalue()
+        if len(output) >= len(data): # 重新编码后没有变小
+            return None
+        return output
 
 # 将文件转换为字符串
 def f2s(file: Union[str, bytes, BytesIO, Path]) -> str:
@@ -225,14 +1358,27 @@ def f2s(file: Union[str, bytes, BytesIO, Path]) -> str:
     if isinstance(file, BytesIO): # 如果是 BytesIO 对象
         file = file.getvalue()
     if isinstance(file, bytes): # 如果是字节对象
-        file = f'base64://{b64encode(file).decode()}'
+        if MediaSpool.accepts(file): # 较大的数据写入本地媒体缓存
+            file = MediaSpool.store(file)
+        else:
+            file = f'base64://{b64encode(file).decode()}'
     elif isinstance(file, Path): # 如果是路径对象
         file = file.resolve().as_uri()
     return file
 
+# 转义映射
+_ESCAPE_PAIRS = (('&', '&amp;'), ('[', '&#91;'), (']', '&#93;'))
+'''转义映射，`&` 必须最先处理'''
+
+# 去转义映射
+_UNESCAPE_MAP = {'&amp;': '&', '&#91;': '[', '&#93;': ']', '&#44;': ','}
+'''去转义映射'''
+_UNESCAPE_PATTERN = re.compile('&(?:amp|#91|#93|#44);')
+'''去转义匹配正则'''
+
 # 对字符串进行转义
 def escape(string: str, *, escape_comma: bool=False) -> str:
-    '''对字符串进行转义
+    '''对字符串进行转义，没有需要转义的字符时返回原字符串对象
 
     :param string: 需要转义的字符串
     :type string: str
@@ -241,23 +1387,22 @@ def escape(string: str, *, escape_comma: bool=False) -> str:
     :return: 转义后的字符串
     :rtype: str
     '''
-    string = string.replace('&', '&amp;').replace('[', '&#91;').replace(']', '&#93;')
-    if escape_comma:
+    for char, entity in _ESCAPE_PAIRS:
+        if char in string:
+            string = string.replace(char, entity)
+    if escape_comma and ',' in string:
         string = string.replace(',', '&#44;')
     return string
 
 # 对字符串进行去转义
 def unescape(string: str) -> str:
-    '''对字符串进行转义
+    '''对字符串进行去转义，没有需要去转义的内容时返回原字符串对象
 
     :param string: 需要去转义的字符串
     :type string: str
     :return: 去转义后的字符串
     :rtype: str
     '''
-    return (
-        string.replace('&#44;', ',')
-        .replace('&#91;', '[')
-        .replace('&#93;', ']')
-        .replace('&amp;', '&')
-    )
+    if '&' not in string:
+        return string
+    return _UNESCAPE_PATTERN.sub(lambda match: _UNESCAPE_MAP[match.group()], string)
@@ -0,0 +1,124 @@
+'''插件分发基准测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+以不同数量的示例插件测量 `message_hand_out` 处理一条消息的耗时。
+每个示例插件自行检查消息是否以自己的命令开头，对比所有插件都未声明 `COMMANDS` （全部接收）
+与都声明了 `COMMANDS` （经命令前缀树路由）两种情况，消息分别为普通聊天与最后一个插件的命令。
+
+运行::
+
+    python bench/dispatch.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+import time
+import types
+import asyncio
+import tempfile
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import adapter.utils
+import distributer
+from router import PluginRouter
+from adapter.bot import Bot
+from adapter.event import Event
+from adapter.utils import Logging
+from adapter.adapter import Adapter
+
+# 插件数量
+PLUGIN_COUNTS = (10, 40, 100)
+
+# 每种情况处理的消息数
+EVENTS = 2000
+
+# 构建群消息上报
+def group_message(text: str) -> dict[str, Any]:
+    '''构建群消息上报
+
+    :param text: 消息文本
+    :type text: str
+    :return: 上报数据
+    :rtype: dict[str, Any]
+    '''
+    return {
+        'post_type': 'message', 'message_type': 'group', 'sub_type': 'normal',
+        'time': 1, 'self_id': 123456, 'message_id': 7, 'user_id': 42, 'group_id': 1001,
+        'anonymous': None, 'message': text, 'raw_message': text, 'font': 0,
+        'sender': {
+            'user_id': 42, 'nickname': 'n', 'sex': 'unknown', 'age': 0, 'card': '', 'role': 'member', 'title': ''
+        },
+    }
+
+# 安装示例插件
+def install(count: int, declare: bool) -> None:
+    '''安装示例插件
+
+    :param count: 插件数量
+    :type count: int
+    :param declare: 是否声明 `COMMANDS`
+    :type declare: bool
+    '''
+    plugin_dict: dict[str, dict[str, Any]] = {}
+    for index in range(count):
+        plugin = types.ModuleType(f'plugin_bench_{index}')
+        exec(
+            'async def main(bot, event):\n'
+            f'    if not event.raw_message.startswith("/c{index} "):\n'
+            '        return "None"\n'
+            '    return "OK"\n',
+            plugin.__dict__
+        )
+        plugin_dict[plugin.__name__] = {
+            'plugin': plugin,
+            'name': plugin.__name__,
+            'function_list': [],
+            'level': 'normal',
+            'priority': 0,
+            'block': True,
+            'timeout': distributer.PLUGIN_TIMEOUT,
+            'commands': [f'/c{index} '] if declare else None,
+            'keywords': None,
+            'patterns': None,
+        }
+    distributer.plugin_dict = plugin_dict
+    distributer.plugin_router = PluginRouter(plugin_dict)
+
+# 测量处理一条消息的耗时
+async def measure(bot: Bot, event: Event) -> float:
+    '''测量处理一条消息的耗时
+
+    :return: 单条消息微秒数
+    :rtype: float
+    '''
+    begin = time.perf_counter()
+    for _ in range(EVENTS):
+        await distributer.message_hand_out(bot, event)
+    return (time.perf_counter() - begin) / EVENTS * 1e6
+
+# 基准测试入口
+async def main() -> None:
+    '''基准测试入口'''
+    bot = Bot(1, 2, Adapter(port_send=1))
+    chat = bot.post2event(group_message('今天天气真好啊，大家吃饭了吗'))
+    print(f'{"plugins":>8}{"chat, all":>14}{"chat, routed":>14}{"cmd, all":>14}{"cmd, routed":>14}')
+    for count in PLUGIN_COUNTS:
+        command = bot.post2event(group_message(f'/c{count - 1} 参数'))
+        results = {}
+        for declare in (False, True):
+            install(count, declare)
+            results[declare] = (await measure(bot, chat), await measure(bot, command))
+        print(
+            f'{count:8d}{results[False][0]:12.1f}us{results[True][0]:12.1f}us'
+            f'{results[False][1]:12.1f}us{results[True][1]:12.1f}us'
+        )
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        adapter.utils.CURRENT_DIR = directory # 日志写入临时目录
+        Logging.configure(level='ERROR', console=False)
+        asyncio.run(main())
+        Logging.shutdown()
@@ -0,0 +1,81 @@
+'''转义与去转义基准测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+以长聊天文本对比 `adapter.utils.escape` / `unescape` 与逐次调用 `str.replace` 的旧实现，
+并校验两者结果一致。
+
+运行::
+
+    python bench/escape.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapter.utils import escape, unescape
+
+# 旧的转义实现
+def replace_escape(string: str, *, escape_comma: bool=False) -> str:
+    '''旧的转义实现，每次替换都复制整个字符串'''
+    string = string.replace('&', '&amp;').replace('[', '&#91;').replace(']', '&#93;')
+    if escape_comma:
+        string = string.replace(',', '&#44;')
+    return string
+
+# 旧的去转义实现
+def replace_unescape(string: str) -> str:
+    '''旧的去转义实现，每次替换都复制整个字符串'''
+    return (
+        string.replace('&#44;', ',')
+        .replace('&#91;', '[')
+        .replace('&#93;', ']')
+        .replace('&amp;', '&')
+    )
+
+# 测量单次调用耗时
+def measure(func: Callable[[], object], number: int=2000) -> float:
+    '''测量单次调用耗时
+
+    :param func: 要测量的函数
+    :type func: Callable[[], object]
+    :param number: 调用次数
+    :type number: int, optional
+    :return: 单次调用微秒数
+    :rtype: float
+    '''
+    begin = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - begin) / number * 1e6
+
+# 基准测试入口
+def main() -> None:
+    '''基准测试入口'''
+    plain = '今天天气不错，我们去公园玩吧 hello world ' * 2000
+    special = plain + '[doge] & [CQ:xx]'
+    escaped = escape(special, escape_comma=True)
+    assert escape(special, escape_comma=True) == replace_escape(special, escape_comma=True)
+    assert unescape(escaped) == replace_unescape(escaped)
+    
+    print(f'文本长度：{len(plain):,}')
+    print(f'{"":30}{"replace":>10}{"current":>10}')
+    cases = [
+        ('escape, no specials', lambda: replace_escape(plain), lambda: escape(plain)),
+        (
+            'escape, few specials + comma',
+            lambda: replace_escape(special, escape_comma=True),
+            lambda: escape(special, escape_comma=True)
+        ),
+        ('unescape, no entities', lambda: replace_unescape(plain), lambda: unescape(plain)),
+        ('unescape, few entities', lambda: replace_unescape(escaped), lambda: unescape(escaped)),
+    ]
+    for name, old, new in cases:
+        print(f'{name:30}{measure(old):8.1f}us{measure(new):8.1f}us')
+
+if __name__ == '__main__':
+    main()
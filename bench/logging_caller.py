@@ -0,0 +1,73 @@
+'''日志调用基准测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+对比旧的 `inspect.stack()` 调用者查找与 `sys._getframe` 查找的耗时，
+并测量直接调用与调用栈加深 20 层时每秒可记录的日志条数。日志写入临时目录。
+
+运行::
+
+    python bench/logging_caller.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+import time
+import inspect
+import tempfile
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import adapter.utils
+from adapter.utils import Logging
+
+# 旧的调用者查找
+def inspect_name() -> str:
+    '''旧的调用者查找，为整个调用栈构建带源码上下文的帧记录'''
+    module = inspect.getmodule(inspect.stack()[1][0])
+    return module.__name__ if module is not None else '__main__'
+
+# 当前的调用者查找
+def frame_name() -> str:
+    '''当前的调用者查找'''
+    return Logging._get_name(sys._getframe(1))
+
+# 加深调用栈后调用
+def nested(depth: int, func: Callable[[], object]) -> object:
+    '''加深调用栈后调用'''
+    return func() if depth == 0 else nested(depth - 1, func)
+
+# 测量每秒调用次数
+def rate(func: Callable[[], object], number: int=2000) -> float:
+    '''测量每秒调用次数
+
+    :param func: 要测量的函数
+    :type func: Callable[[], object]
+    :param number: 调用次数
+    :type number: int, optional
+    :return: 每秒调用次数
+    :rtype: float
+    '''
+    begin = time.perf_counter()
+    for _ in range(number):
+        func()
+    return number / (time.perf_counter() - begin)
+
+# 基准测试入口
+def main() -> None:
+    '''基准测试入口'''
+    with tempfile.TemporaryDirectory() as directory:
+        adapter.utils.CURRENT_DIR = directory # 日志写入临时目录
+        log = lambda: Logging.info('收到消息 group_id=123456 user_id=654321')
+        print(f'{"":24}{"direct":>14}{"+20 frames":>14}')
+        for name, func in (
+            ('inspect.stack()', inspect_name),
+            ('sys._getframe', frame_name),
+            ('Logging.info', log),
+        ):
+            print(f'{name:24}{rate(lambda: nested(0, func)):12,.0f}/s{rate(lambda: nested(20, func)):12,.0f}/s')
+        Logging.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''消息拼接基准测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+消息段不可修改，拼接时直接共享，耗时只与消息段数量有关而与内容大小无关。
+分别以小图片与数 MiB 的 base64 图片消息段测试 `Bot.send` 中常见的拼接方式，两者耗时应相近。
+
+运行::
+
+    python bench/message_concat.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapter.message import Message, MessageSegment
+
+# 测量单次调用耗时
+def measure(func: Callable[[], object], number: int=2000) -> float:
+    '''测量单次调用耗时
+
+    :param func: 要测量的函数
+    :type func: Callable[[], object]
+    :param number: 调用次数
+    :type number: int, optional
+    :return: 单次调用微秒数
+    :rtype: float
+    '''
+    begin = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - begin) / number * 1e6
+
+# 构建带图片的消息
+def build(image_size: int) -> Message:
+    '''构建 4 张图片与 1 段文字组成的消息
+
+    :param image_size: 每张图片的字节数
+    :type image_size: int
+    :return: 消息数组
+    :rtype: Message
+    '''
+    images = [MessageSegment.image(os.urandom(image_size)) for _ in range(4)]
+    return Message(images) + MessageSegment.text('caption')
+
+# 基准测试入口
+def main() -> None:
+    '''基准测试入口'''
+    small = build(4 * 1024)
+    large = build(4 * 1024 * 1024)
+    print(f'每张图片 base64 字符数：小 {len(small[0].data["file"]):,} ，大 {len(large[0].data["file"]):,}')
+    print(f'{"":24}{"4 KiB":>10}{"4 MiB":>10}')
+    cases: list[tuple[str, Callable[[Message], Callable[[], object]]]] = [
+        ('at + message', lambda message: lambda: MessageSegment.at(1) + message),
+        ('reply + at + message', lambda message: lambda: MessageSegment.reply(2) + (MessageSegment.at(1) + message)),
+        ('message + seg + seg', lambda message: lambda: message + MessageSegment.text('a') + MessageSegment.text('b')),
+    ]
+    for name, case in cases:
+        print(f'{name:24}{measure(case(small)):8.1f}us{measure(case(large)):8.1f}us')
+
+if __name__ == '__main__':
+    main()
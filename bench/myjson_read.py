@@ -0,0 +1,47 @@
+'''MyJson 重复读取基准测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+以约 300 个群的 Bot 信息文件对比每次重新解析文件，与 `MyJson` 命中缓存时返回副本或只读视图的耗时。
+
+运行::
+
+    python bench/myjson_read.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+import json
+import timeit
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapter.utils import MyJson
+
+# 基准测试入口
+def main() -> None:
+    '''基准测试入口'''
+    data = {
+        'admin_list': list(range(50)),
+        'group_block_list': {str(group_id): ['plugin_a', 'plugin_b', 'plugin_c'] for group_id in range(300)}
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'bot_info.json')
+        MyJson.write(file_name, data)
+        
+        # 每次重新解析文件
+        def parse() -> dict:
+            with open(file_name, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        
+        for name, func in (
+            ('json.load per read', parse),
+            ('read_to_dict', lambda: MyJson.read_to_dict(file_name)),
+            ('read_to_dict(readonly=True)', lambda: MyJson.read_to_dict(file_name, readonly=True)),
+        ):
+            seconds = min(timeit.repeat(func, number=500, repeat=5)) / 500
+            print(f'{name:30}{seconds * 1e6:8.1f} us')
+
+if __name__ == '__main__':
+    main()
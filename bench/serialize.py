@@ -0,0 +1,64 @@
+'''发送序列化基准测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+对比每次发送时构建消息并 `json.dumps(message.__list__)` 的旧方式，
+与渲染预序列化的消息模板、重复发送已缓存序列化结果的消息。
+
+运行::
+
+    python bench/serialize.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+import json
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapter.message import Message, MessageSegment, MessageTemplate
+
+# 管理员回复模板
+ADMIN_ADDED = MessageTemplate(
+    '<√> ',
+    MessageTemplate.slot('target', 'at', 'qq', int, {'name': None}),
+    ' 已被设置为管理员。'
+)
+
+# 测量单次调用耗时
+def measure(func: Callable[[], object], number: int=20000) -> float:
+    '''测量单次调用耗时
+
+    :param func: 要测量的函数
+    :type func: Callable[[], object]
+    :param number: 调用次数
+    :type number: int, optional
+    :return: 单次调用微秒数
+    :rtype: float
+    '''
+    begin = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - begin) / number * 1e6
+
+# 以旧方式构建管理员回复
+def build_reply(user_id: int) -> str:
+    '''以旧方式构建管理员回复并序列化'''
+    message = MessageSegment.text('<√> ') + MessageSegment.at(user_id) + MessageSegment.text(' 已被设置为管理员。')
+    return json.dumps(message.__list__)
+
+# 基准测试入口
+def main() -> None:
+    '''基准测试入口'''
+    assert json.loads(build_reply(123)) == json.loads(ADMIN_ADDED.render(target=123).payload)
+    long = Message([MessageSegment.text(f'line {index}\n') for index in range(50)])
+    
+    print(f'管理员回复，构建 + json.dumps   {measure(lambda: build_reply(123)):8.2f} us')
+    print(f'管理员回复，模板渲染            {measure(lambda: ADMIN_ADDED.render(target=123)):8.2f} us')
+    print(f'50 段消息，每次 json.dumps      {measure(lambda: json.dumps(long.__list__)):8.2f} us')
+    print(f'50 段消息，serialize() 缓存     {measure(long.serialize):8.2f} us')
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,21 @@
 # -*- coding: utf-8 -*-
 # !/usr/bin/python3
 import os
+import re
 import sys
+import time
 import types
 import asyncio
 import importlib
-from typing import Any
+from typing import Union, Any
 
 from adapter.bot import Bot
 from adapter.utils import Logging
-from adapter.message import Message, MessageSegment
+from adapter.message import Message, MessageSegment, MessageTemplate
 from adapter.event import Event, MessageEvent, GroupMessageEvent
 
 from utils import text_to_image
+from router import PluginRouter, to_list
 
 # 获取当前文件所在目录
 CURRENT_DIR = os.path.dirname(__file__)
@@ -20,10 +23,43 @@ CURRENT_DIR = os.path.dirname(__file__)
 # 添加插件所在目录
 sys.path.append(CURRENT_DIR + '/plugin')
 
+# 较长的帮助是否渲染为图片发送，否则将分页为合并转发消息发送
+HELP_AS_IMAGE = False
+
+# 插件分发模式
+# sequential ：按优先级依次调用，阻断插件返回 `OK` 后不再调用之后的插件
+# first ：同时调用，阻断插件返回 `OK` 后取消其余尚未完成的插件
+# all ：同时调用，等待所有插件完成
+DISPATCH_MODE = 'sequential'
+
+# 插件默认超时时间（秒），超时的插件将被取消，插件可通过 `TIMEOUT` 单独声明， `None` 为不限制
+PLUGIN_TIMEOUT = 30.0
+
+# 插件连续超时达到此次数后将被暂停调用
+SUSPEND_AFTER = 3
+
+# 插件被暂停调用的时长（秒）
+SUSPEND_SECONDS = 600.0
+
 # 插件字典
 global plugin_dict
 plugin_dict: dict[str, dict[str, Any]] = {}
 
+# 插件路由，插件更新时重建
+global plugin_router
+plugin_router = PluginRouter({})
+
+# 插件调用统计，插件更新时保留
+global plugin_stats
+plugin_stats: dict[str, dict[str, Union[int, float]]] = {}
+
+# 管理员操作回复模板
+_ADMIN_TARGET = MessageTemplate.slot('target', 'at', 'qq', int, {'name': None})
+ADMIN_ADDED = MessageTemplate('<√> ', _ADMIN_TARGET, ' 已被设置为管理员。')
+ADMIN_ALREADY = MessageTemplate('<!> ', _ADMIN_TARGET, ' 已经是管理员了。')
+ADMIN_REMOVED = MessageTemplate('<√> ', _ADMIN_TARGET, ' 不再是管理员了。')
+ADMIN_NOT = MessageTemplate('<!> ', _ADMIN_TARGET, ' 不是管理员。')
+
 # 消息分发转交
 async def message_hand_out(bot: Bot, event: Event) -> str:
     '''消息分发转交
@@ -41,32 +77,29 @@ async def message_hand_out(bot: Bot, event: Event) -> str:
         try:
             plugin_dict = refresh_plugin()
         except Exception as exception:
-            print(f'导入插件时出错：{exception}')
-            Logging.info(f'导入插件时出错：{exception}')
+            Logging.warn(f'导入插件时出错：{exception}', echo=True)
             Logging.error(exception)
             return 'None'
     
     if isinstance(event, MessageEvent): # 如果是消息
         # 判断是否为管理语句
         if (
-            (message_string := str(event.message)).startswith('>> ') and
+            event.message.startswith('>> ') and
             bot.admin.is_admin(event.user_id)
         ): # 如果以固定字符组开头且来自主人id或管理员
             # 管理语句提取
-            admin_message = message_string[3:]
+            admin_message = str(event.message)[3:]
             
             # 如果是管理员操作语句且来自主人id
             if admin_message.startswith('管理员') and event.user_id == bot.host_id:
                 admin_message = admin_message[3:]
                 # 提取第一个@对象为操作目标 ID
                 target_id = -1
-                for segment in event.message:
-                    if segment.type == 'at':
-                        try:
-                            target_id = int(segment.data['qq'])
-                            break
-                        except:
-                            return 'None'
+                if (segment := event.message.first('at')) is not None:
+                    try:
+                        target_id = int(segment.data['qq'])
+                    except:
+                        return 'None'
                 
                 # 如果是添加管理员
                 if admin_message.startswith('添加'):
@@ -74,20 +107,10 @@ async def message_hand_out(bot: Bot, event: Event) -> str:
                     try:
                         result = bot.admin.add(target_id)
                         if result == 'Add Successfully':
-                            message = Message([
-                                MessageSegment.text('<√> '),
-                                MessageSegment.at(target_id),
-                                MessageSegment.text(' 已被设置为管理员。')
-                            ])
-                            bot.send(event, message)
+                            bot.send(event, ADMIN_ADDED.render(target=target_id))
                             return 'OK'
                         elif result == 'Already Admin':
-                            message = Message([
-                                MessageSegment.text('<!> '),
-                                MessageSegment.at(target_id),
-                                MessageSegment.text(' 已经是管理员了。')
-                            ])
-                            bot.send(event, message)
+                            bot.send(event, ADMIN_ALREADY.render(target=target_id))
                             return 'OK'
                     except Exception as exception:
                         bot.send(event, '<×> 啊嘞？好像哪里有点问题？')
@@ -100,21 +123,11 @@ async def message_hand_out(bot: Bot, event: Event) -> str:
                     try:
                         result = bot.admin.remove(target_id)
                         if result == 'Remove Successfully':
-                            message = Message([
-                                MessageSegment.text('<√> '),
-                                MessageSegment.at(target_id),
-                                MessageSegment.text(' 不再是管理员了。')
-                            ])
-                            bot.send(event, message)
+                            bot.send(event, ADMIN_REMOVED.render(target=target_id))
                             return 'OK'
                         elif result == 'Not Admin':
                             
-                            message = Message([
-                                MessageSegment.text('<!> '),
-                                MessageSegment.at(target_id),
-                                MessageSegment.text(' 不是管理员。')
-                            ])
-                            bot.send(event, message)
+                            bot.send(event, ADMIN_NOT.render(target=target_id))
                             return 'OK'
                     except Exception as exception:
                         bot.send(event, '<×> 啊嘞？好像哪里有点问题？')
@@ -143,11 +156,15 @@ async def message_hand_out(bot: Bot, event: Event) -> str:
                     Logging.info('插件更新成功')
                     return 'OK'
                 except Exception as exception:
-                    print(f'{exception}')
-                    Logging.info(f'导入插件时出错：{exception}')
+                    Logging.warn(f'导入插件时出错：{exception}', echo=True)
                     Logging.error(exception)
                     bot.send(event, '<!> 插件更新失败')
                     return 'None'
+            
+            # 如果是查看插件统计
+            if admin_message == '插件统计':
+                bot.send(event, stats_text(), paginate=True)
+                return 'OK'
                 
             # 如果是要求黑名单插件且是群组消息
             if admin_message.startswith('屏蔽 ') and isinstance(event, GroupMessageEvent):
@@ -245,7 +262,7 @@ async def message_hand_out(bot: Bot, event: Event) -> str:
             if isinstance(event, GroupMessageEvent):
                 block_list = bot.block_list.get_list(event.group_id)
             else:
-                block_list = []
+                block_list = frozenset()
             
             # 根据请求信息构建回应
             if help_message == '': # 如果请求信息为空
@@ -263,12 +280,15 @@ async def message_hand_out(bot: Bot, event: Event) -> str:
                     help_reply += plugin_dict[plugin_name]['name'] + '\n'
                 help_reply += '获取指定功能帮助请发送 help + 功能名'
                 # 发送回复
-                bot.send(
-                    event,
-                    MessageSegment.image(
-                        text_to_image(Message(help_reply))
+                if HELP_AS_IMAGE:
+                    bot.send(
+                        event,
+                        MessageSegment.image(
+                            text_to_image(Message(help_reply))
+                        )
                     )
-                )
+                else:
+                    bot.send(event, help_reply, paginate=True)
                 return 'OK'
             
             else:
@@ -279,47 +299,174 @@ async def message_hand_out(bot: Bot, event: Event) -> str:
                         help_message == plugin_info['name']
                     ]): # 如果请求信息是功能名
                         event.message = Message('>> help') # 伪造信息
-                        if (help_reply := await plugin_info['plugin'].help(bot, event)) != 'None': # 有帮助返回
-                            if len(help_reply) >= 200: # 如果帮助较长
+                        if (help_reply := await _run_plugin(plugin_name, bot, event, 'help')) != 'None': # 有帮助返回
+                            if HELP_AS_IMAGE and len(help_reply) >= 200: # 如果帮助较长
                                 help_reply = MessageSegment.image(
                                     text_to_image(Message(help_reply))
                                 )
-                            bot.send(event, help_reply)
+                            bot.send(event, help_reply, paginate=True)
                             return 'OK'
                         
                 event.message = Message('>> ' + help_message) # 伪造信息
                 help_tasks = [] # 创建任务列表
                 for plugin_name in plugin_dict: # 遍历插件，此时将会无视黑名单群发
-                    help_tasks.append(asyncio.create_task(plugin_dict[plugin_name]['plugin'].help(bot, event)))
-                for help_task in help_tasks: # 执行任务列表
-                    if (help_reply := (await asyncio.gather(help_task))[0]) != 'None': # 有帮助返回
-                        if len(help_reply) >= 200: # 如果帮助较长
-                            help_reply = MessageSegment.image(
-                                text_to_image(Message(help_reply))
-                            )
-                        bot.send(event, help_reply)
-                        return 'OK'
+                    help_tasks.append(asyncio.create_task(_run_plugin(plugin_name, bot, event, 'help')))
+                try:
+                    for help_task in help_tasks: # 按顺序等待任务
+                        if (help_reply := await help_task) != 'None': # 有帮助返回
+                            if HELP_AS_IMAGE and len(help_reply) >= 200: # 如果帮助较长
+                                help_reply = MessageSegment.image(
+                                    text_to_image(Message(help_reply))
+                                )
+                            bot.send(event, help_reply, paginate=True)
+                            return 'OK'
+                finally:
+                    for help_task in help_tasks: # 取消其余尚未完成的任务
+                        help_task.cancel()
                 return 'None'
                 
     # 将消息进行分发
-    # 建立插件任务列表
-    handle_tasks = []
     # 获取黑名单列表
     if not (group_id := getattr(event, 'group_id', None)) is None:
         block_list = bot.block_list.get_list(group_id)
     else:
-        block_list: list[str] = []
-    # 构建任务列表
-    for plugin_name, plugin_info in plugin_dict.items():
-        if not plugin_name in block_list:
-            handle_tasks.append(asyncio.create_task(plugin_info['plugin'].main(bot, event))) # 创建并添加任务
-        
-    # 遍历执行插件任务
-    for handle_task in handle_tasks:
-        if (await asyncio.gather(handle_task))[0] == 'OK':
-            return 'OK'
-        
-    return 'None'
+        block_list = frozenset()
+    # 只转交给触发条件匹配的插件与全部接收的插件
+    if isinstance(event, MessageEvent):
+        plugin_names = plugin_router.route(event.message.extract_plain_text().lstrip())
+    else:
+        plugin_names = plugin_router.route(None)
+    plugin_names = [plugin_name for plugin_name in plugin_names if not plugin_name in block_list]
+    
+    # 按分发模式调用插件
+    return await dispatch(bot, event, plugin_names, DISPATCH_MODE)
+
+# 按分发模式调用插件
+async def dispatch(bot: Bot, event: Event, plugin_names: list[str], mode: str='sequential') -> str:
+    '''按分发模式调用插件
+
+    :param bot: Bot 实例
+    :type bot: Bot
+    :param event: 收到的 Event 实例
+    :type event: Event
+    :param plugin_names: 按优先级排列的插件包名列表
+    :type plugin_names: list[str]
+    :param mode: 分发模式： `sequential` 、 `first` 或 `all`
+    :type mode: str, optional
+    :return: 处理结果，任意插件返回 `OK` 时为 `OK`
+    :rtype: str
+    '''
+    if not mode in ('sequential', 'first', 'all'):
+        raise ValueError(f'不支持的分发模式：{mode}')
+    result = 'None'
+    
+    # 依次调用，阻断插件处理后不再继续
+    if mode == 'sequential':
+        for plugin_name in plugin_names:
+            if await _run_plugin(plugin_name, bot, event) == 'OK':
+                result = 'OK'
+                if plugin_dict[plugin_name]['block']:
+                    break
+        return result
+    
+    tasks = {
+        asyncio.create_task(_run_plugin(plugin_name, bot, event)): plugin_name
+        for plugin_name in plugin_names
+    }
+    if not tasks:
+        return result
+    
+    # 同时调用，等待所有插件完成
+    if mode == 'all':
+        results = await asyncio.gather(*tasks)
+        return 'OK' if 'OK' in results else result
+    
+    # 同时调用，阻断插件处理后取消其余插件
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result() == 'OK':
+                    result = 'OK'
+                    if plugin_dict[tasks[task]]['block']:
+                        return result
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    return result
+
+# 调用插件
+async def _run_plugin(plugin_name: str, bot: Bot, event: Event, handler: str='main') -> str:
+    '''调用插件，插件抛出的异常将被记录而不影响其他插件，超时的插件将被取消，连续超时的插件将被暂停调用
+
+    :param plugin_name: 插件包名
+    :type plugin_name: str
+    :param bot: Bot 实例
+    :type bot: Bot
+    :param event: 收到的 Event 实例
+    :type event: Event
+    :param handler: 调用的插件函数： `main` 或 `help`
+    :type handler: str, optional
+    :return: 插件处理结果
+    :rtype: str
+    '''
+    stats = plugin_stats.setdefault(
+        plugin_name,
+        {'calls': 0, 'timeouts': 0, 'suspensions': 0, 'skipped': 0, 'strikes': 0, 'suspended_until': 0.0}
+    )
+    if stats['suspended_until'] > time.monotonic(): # 暂停调用中
+        stats['skipped'] += 1
+        return 'None'
+    stats['calls'] += 1
+    
+    timeout = plugin_dict[plugin_name].get('timeout', PLUGIN_TIMEOUT)
+    try:
+        async with asyncio.timeout(timeout) as budget:
+            result = await getattr(plugin_dict[plugin_name]['plugin'], handler)(bot, event)
+    except TimeoutError as exception:
+        if not budget.expired(): # 插件自身抛出的超时按普通错误处理
+            Logging.warn(f'插件 {plugin_name} 处理时出错：{exception}', echo=True)
+            Logging.error(exception)
+            return 'None'
+        stats['timeouts'] += 1
+        stats['strikes'] += 1
+        Logging.warn(f'插件 {plugin_name} 处理超时（{timeout} 秒），已取消', echo=True)
+        if stats['strikes'] >= SUSPEND_AFTER:
+            stats['strikes'] = 0
+            stats['suspensions'] += 1
+            stats['suspended_until'] = time.monotonic() + SUSPEND_SECONDS
+            Logging.warn(f'插件 {plugin_name} 连续超时 {SUSPEND_AFTER} 次，暂停调用 {SUSPEND_SECONDS} 秒', echo=True)
+        return 'None'
+    except Exception as exception:
+        Logging.warn(f'插件 {plugin_name} 处理时出错：{exception}', echo=True)
+        Logging.error(exception)
+        return 'None'
+    stats['strikes'] = 0
+    return result
+
+# 生成插件统计文本
+def stats_text() -> str:
+    '''生成插件统计文本
+
+    :return: 插件统计文本
+    :rtype: str
+    '''
+    if not plugin_stats:
+        return '还没有插件被调用过。'
+    now = time.monotonic()
+    lines = ['插件调用统计：']
+    for plugin_name, stats in plugin_stats.items():
+        line = (
+            f'{plugin_name}：调用 {stats["calls"]} 次，超时 {stats["timeouts"]} 次，'
+            f'暂停 {stats["suspensions"]} 次，暂停期间跳过 {stats["skipped"]} 次'
+        )
+        if (remain := stats['suspended_until'] - now) > 0:
+            line += f'，暂停中（剩余 {int(remain)} 秒）'
+        lines.append(line)
+    return '\n'.join(lines)
 
 # 插件初始化与更新
 def refresh_plugin() -> dict:
@@ -364,8 +511,7 @@ def refresh_plugin() -> dict:
             plugin = importlib.import_module(f'{plugin_name}')
             _reload_recursive_in_iter(plugin)
         except Exception as exception:
-            print(f'导入插件 {plugin_name} 时出错：{exception}')
-            Logging.info(f'导入插件 {plugin_name} 时出错：{exception}')
+            Logging.warn(f'导入插件 {plugin_name} 时出错：{exception}', echo=True)
             continue
         
         plugin_dict[plugin_name] = {'plugin': plugin}
@@ -387,5 +533,45 @@ def refresh_plugin() -> dict:
             plugin_dict[plugin_name]['level'] = level
         except AttributeError:
             plugin_dict[plugin_name]['level'] = 'normal'
+        # 尝试获取插件优先级，数值越小越先调用
+        try:
+            priority = getattr(plugin, 'PRIORITY')
+            plugin_dict[plugin_name]['priority'] = int(priority)
+        except AttributeError:
+            plugin_dict[plugin_name]['priority'] = 0
+        except (TypeError, ValueError):
+            Logging.warn(f'插件 {plugin_name} 的 PRIORITY 不合法：{priority!r}', echo=True)
+            plugin_dict[plugin_name]['priority'] = 0
+        # 尝试获取插件是否阻断，阻断插件返回 `OK` 后不再调用之后的插件
+        plugin_dict[plugin_name]['block'] = bool(getattr(plugin, 'BLOCK', True))
+        # 尝试获取插件超时时间，未声明时使用默认超时时间
+        try:
+            timeout = getattr(plugin, 'TIMEOUT')
+            plugin_dict[plugin_name]['timeout'] = None if timeout is None else float(timeout)
+        except AttributeError:
+            plugin_dict[plugin_name]['timeout'] = PLUGIN_TIMEOUT
+        except (TypeError, ValueError):
+            Logging.warn(f'插件 {plugin_name} 的 TIMEOUT 不合法：{timeout!r}', echo=True)
+            plugin_dict[plugin_name]['timeout'] = PLUGIN_TIMEOUT
+        # 插件更新后解除暂停调用
+        if (stats := plugin_stats.get(plugin_name)) is not None:
+            stats['strikes'] = 0
+            stats['suspended_until'] = 0.0
+        # 尝试获取命令前缀、关键词与正则列表，均未声明时全部接收
+        for key, attribute in (('commands', 'COMMANDS'), ('keywords', 'KEYWORDS'), ('patterns', 'PATTERNS')):
+            try:
+                value = to_list(getattr(plugin, attribute, None))
+                if key == 'keywords' and value is not None and not all(value):
+                    raise ValueError('关键词不能为空')
+                if key == 'patterns' and value is not None:
+                    value = [re.compile(pattern) for pattern in value]
+                plugin_dict[plugin_name][key] = value
+            except (TypeError, ValueError, re.error) as exception:
+                Logging.warn(f'插件 {plugin_name} 的 {attribute} 不合法：{exception}', echo=True)
+                plugin_dict[plugin_name][key] = None
+    
+    # 重建插件路由（命令前缀树、关键词自动机与合并的正则）
+    global plugin_router
+    plugin_router = PluginRouter(plugin_dict)
             
     return plugin_dict
\ No newline at end of file
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 # !/usr/bin/python3
+import os
 import asyncio
 from flask import Flask, request
 
@@ -8,18 +9,36 @@ from distributer import message_hand_out
 from adapter.bot import Bot
 from adapter.event import Event
 from adapter.utils import Logging
+from adapter.store import StateStore
 from adapter.adapter import Adapter
 
+# 获取当前文件所在目录
+CURRENT_DIR = os.path.dirname(__file__)
+
 # 反向监听端口
 PORT = 5700
 
+# 日志配置
+Logging.configure(
+    level='INFO', # 默认日志等级：DEBUG / INFO / WARN / ERROR
+    module_levels={}, # 各模块日志等级，如 {'adapter.adapter': 'WARN'}
+    console=True, # 是否在控制台回显收到的消息与 API 调用状态
+    sample_rates={}, # 各类别记录比例，类别有 message 、 poke 、 heartbeat 、 api ，如 {'api': 0.1}
+    log_format='text', # 日志格式：text 为文本日志， json 为可用 python -m adapter.logarchive 查询的 json 行日志
+    compress=True # 是否在跨日后压缩 json 行日志并建立索引
+)
+
 # 生成 Flask 类的 app 实例
 app = Flask(__name__)
 # 创建一个 bot 实例
 bot = Bot(
     123456, # 机器人 ID
     123321, # 主人 ID
-    Adapter(port_send=5701) # 监听端口
+    Adapter(port_send=5701), # 监听端口
+    store=StateStore( # 管理员与黑名单存储，首次启动时将从 bot_info.json 迁移
+        CURRENT_DIR + '/resources/bot_info.db',
+        migrate_from=CURRENT_DIR + '/resources/bot_info.json'
+    )
 )
 
 # 收取消息处理
@@ -30,8 +49,7 @@ def get_post() -> str:
     try:
         event = bot.post2event(request.get_json())
     except Exception as exception:
-        Logging.info(f'事件转换失败：{exception}')
-        print(f'事件转换失败：{exception}')
+        Logging.warn(f'事件转换失败：{exception}', echo=True)
         return 'None'
     
     # 尝试分发事件上报
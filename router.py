@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import re
+from collections import deque
+from typing import Optional, Union, Any
+from collections.abc import Iterable
+
+# 命令前缀树类
+class CommandTrie:
+    '''命令前缀树类，一次遍历消息开头即可找出所有前缀匹配的插件'''
+    def __init__(self) -> None:
+        self.root: dict[Optional[str], Any] = {}
+        '''根节点：字符 -> 子节点，键 `None` 下存放以该节点结尾的命令所属的插件'''
+    
+    # 添加命令
+    def add(self, command: str, plugin_name: str) -> None:
+        '''添加命令
+
+        :param command: 命令前缀
+        :type command: str
+        :param plugin_name: 插件包名
+        :type plugin_name: str
+        '''
+        node = self.root
+        for char in command:
+            node = node.setdefault(char, {})
+        node.setdefault(None, set()).add(plugin_name)
+    
+    # 匹配消息
+    def match(self, text: str) -> set[str]:
+        '''匹配消息，返回所有命令为消息前缀的插件
+
+        :param text: 消息文本
+        :type text: str
+        :return: 插件包名集合
+        :rtype: set[str]
+        '''
+        matched: set[str] = set()
+        node = self.root
+        for char in text:
+            if (node := node.get(char)) is None:
+                break
+            if None in node:
+                matched |= node[None]
+        return matched
+
+# 关键词自动机类
+class KeywordAutomaton:
+    '''关键词自动机类（ Aho-Corasick ），一次遍历消息即可找出所有包含的关键词所属的插件'''
+    def __init__(self) -> None:
+        self.goto: list[dict[str, int]] = [{}]
+        '''状态转移表：状态 -> 字符 -> 下一状态'''
+        self.fail: list[int] = [0]
+        '''失配转移表'''
+        self.output: list[frozenset[str]] = [frozenset()]
+        '''各状态匹配到的插件包名集合'''
+        self._outputs: list[set[str]] = [set()]
+        '''构建中的插件包名集合'''
+    
+    # 添加关键词
+    def add(self, keyword: str, plugin_name: str) -> None:
+        '''添加关键词，添加完成后需调用 `build`
+
+        :param keyword: 关键词
+        :type keyword: str
+        :param plugin_name: 插件包名
+        :type plugin_name: str
+        '''
+        if not keyword:
+            raise ValueError('关键词不能为空')
+        state = 0
+        for char in keyword:
+            if (next_state := self.goto[state].get(char)) is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self._outputs.append(set())
+                self.goto[state][char] = next_state
+            state = next_state
+        self._outputs[state].add(plugin_name)
+    
+    # 构建失配转移
+    def build(self) -> None:
+        '''按广度优先构建失配转移，并将失配状态的匹配结果合并到当前状态'''
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and not char in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                self._outputs[next_state] |= self._outputs[self.fail[next_state]]
+        self.output = [frozenset(outputs) for outputs in self._outputs]
+    
+    # 匹配消息
+    def match(self, text: str) -> set[str]:
+        '''匹配消息，返回所有关键词出现在消息中的插件
+
+        :param text: 消息文本
+        :type text: str
+        :return: 插件包名集合
+        :rtype: set[str]
+        '''
+        matched: set[str] = set()
+        if len(self.goto) == 1:
+            return matched
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and not char in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                matched |= output[state]
+        return matched
+
+# 正则集合类
+class PatternSet:
+    '''正则集合类，所有正则合并为一个分支表达式，消息不匹配任何正则时只需搜索一次。
+
+    分支不使用捕获分组，以保留正则引擎对公共前缀与首字符集合的优化；
+    合并表达式匹配后再逐个确认是哪些正则匹配。
+    '''
+    def __init__(self) -> None:
+        self.patterns: list[tuple[re.Pattern, str]] = []
+        '''正则与所属插件包名列表'''
+        self.combined: Optional[re.Pattern] = None
+        '''合并后的分支表达式'''
+        self.separate: list[tuple[re.Pattern, str]] = []
+        '''无法合并的正则（含反向引用），需单独搜索'''
+    
+    # 添加正则
+    def add(self, pattern: Union[str, re.Pattern], plugin_name: str) -> None:
+        '''添加正则，添加完成后需调用 `build`
+
+        :param pattern: 正则表达式
+        :type pattern: Union[str, re.Pattern]
+        :param plugin_name: 插件包名
+        :type plugin_name: str
+        '''
+        self.patterns.append((re.compile(pattern), plugin_name))
+    
+    # 构建合并的分支表达式
+    def build(self) -> None:
+        '''构建合并的分支表达式，正则带有的标志转换为局部标志'''
+        branches: list[str] = []
+        for pattern, plugin_name in self.patterns:
+            source = pattern.pattern
+            if isinstance(source, bytes) or re.search(r'\\[1-9]|\(\?P=', source): # 反向引用的编号或名称在合并后会失效
+                self.separate.append((pattern, plugin_name))
+                continue
+            flags = ''.join(
+                flag for flag, value in (('i', re.IGNORECASE), ('m', re.MULTILINE), ('s', re.DOTALL), ('x', re.VERBOSE))
+                if pattern.flags & value
+            )
+            if 'x' in flags: # 换行结束可能存在的注释
+                source += '\n'
+            branches.append(f'(?{flags}:{source})' if flags else f'(?:{source})')
+        if branches:
+            try:
+                self.combined = re.compile('|'.join(branches))
+            except re.error: # 合并失败（如命名分组重名）时全部单独搜索
+                self.combined = None
+                self.separate = list(self.patterns)
+    
+    # 匹配消息
+    def match(self, text: str) -> set[str]:
+        '''匹配消息，返回所有正则能在消息中找到匹配的插件
+
+        :param text: 消息文本
+        :type text: str
+        :return: 插件包名集合
+        :rtype: set[str]
+        '''
+        matched: set[str] = set()
+        if self.combined is not None and self.combined.search(text) is not None:
+            candidates = self.patterns # 有正则匹配，逐个确认
+        else:
+            candidates = self.separate
+        for pattern, plugin_name in candidates:
+            if not plugin_name in matched and pattern.search(text):
+                matched.add(plugin_name)
+        return matched
+
+# 插件路由类
+class PluginRouter:
+    '''插件路由类，根据插件声明的触发条件找出需要处理消息的插件
+
+    插件可在模块中声明以下触发条件，消息纯文本满足其中任意一条时才会被调用：
+
+    - `COMMANDS` ：命令前缀列表，消息以其中之一开头
+    - `KEYWORDS` ：关键词列表，消息中包含其中之一
+    - `PATTERNS` ：正则表达式列表，消息中能找到其中之一的匹配
+
+    三者均未声明的插件视为全部接收，所有消息都将被转交。非消息事件总是转交给所有插件。
+    插件按 `PRIORITY` 从小到大排列，相同优先级保持导入顺序。
+    '''
+    def __init__(self, plugin_dict: dict[str, dict[str, Any]]) -> None:
+        '''插件路由类
+
+        :param plugin_dict: 插件字典
+        :type plugin_dict: dict[str, dict[str, Any]]
+        '''
+        self.order: list[str] = sorted(plugin_dict, key=lambda plugin_name: plugin_dict[plugin_name].get('priority', 0))
+        '''插件调用顺序'''
+        self.catch_all: set[str] = set()
+        '''全部接收的插件'''
+        self.trie = CommandTrie()
+        '''命令前缀树'''
+        self.keywords = KeywordAutomaton()
+        '''关键词自动机'''
+        self.patterns = PatternSet()
+        '''正则集合'''
+        for plugin_name, plugin_info in plugin_dict.items():
+            commands = plugin_info.get('commands')
+            keywords = plugin_info.get('keywords')
+            patterns = plugin_info.get('patterns')
+            if commands is None and keywords is None and patterns is None:
+                self.catch_all.add(plugin_name)
+                continue
+            for command in commands or ():
+                self.trie.add(command, plugin_name)
+            for keyword in keywords or ():
+                self.keywords.add(keyword, plugin_name)
+            for pattern in patterns or ():
+                self.patterns.add(pattern, plugin_name)
+        self.keywords.build()
+        self.patterns.build()
+    
+    # 获取需要处理消息的插件
+    def route(self, text: Optional[str]) -> list[str]:
+        '''获取需要处理消息的插件，按插件调用顺序排列
+
+        :param text: 消息纯文本，非消息事件为 `None`
+        :type text: Optional[str]
+        :return: 插件包名列表
+        :rtype: list[str]
+        '''
+        if text is None:
+            return self.order
+        matched = self.trie.match(text) | self.keywords.match(text) | self.patterns.match(text)
+        if not matched:
+            if len(self.catch_all) == len(self.order):
+                return self.order
+            matched = self.catch_all
+        else:
+            matched |= self.catch_all
+        return [plugin_name for plugin_name in self.order if plugin_name in matched]
+
+# 转换插件声明的触发条件
+def to_list(value: Any) -> Optional[list[Any]]:
+    '''转换插件声明的触发条件，单个字符串或正则视为只有一项
+
+    :param value: 插件声明的值
+    :type value: Any
+    :return: 触发条件列表，未声明时为 `None`
+    :rtype: Optional[list[Any]]
+    '''
+    if value is None:
+        return None
+    if isinstance(value, (str, re.Pattern)):
+        return [value]
+    if isinstance(value, Iterable):
+        return [item if isinstance(item, re.Pattern) else str(item) for item in value]
+    raise TypeError(f'不合法的触发条件：{value!r}')
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import os
+import sys
+
+# 使测试可以导入项目根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+'''异步文件读写的事件循环延迟测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+写入大文件期间运行一个每 5 毫秒唤醒一次的计时任务，
+`await MyJson.awrite` 在文件读写线程池中写入，计时任务的最大延迟应远小于写入耗时。
+
+运行::
+
+    python -m pytest tests/test_async_io.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import time
+import asyncio
+from typing import Any
+
+from adapter.utils import MyJson
+
+# 计时任务唤醒间隔秒数
+TICK = 0.005
+
+# 允许的最大事件循环延迟秒数
+LAG_BOUND = 0.1
+
+# 计时任务
+async def _ticker(stop: asyncio.Event, lags: list[float]) -> None:
+    '''计时任务，记录每次唤醒比预期晚的秒数'''
+    while not stop.is_set():
+        begin = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - begin - TICK)
+
+# 在计时任务运行时写入文件
+async def _write_with_ticker(file_name: str, data: Any) -> tuple[float, float]:
+    '''在计时任务运行时写入文件，返回写入秒数与最大事件循环延迟秒数'''
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(TICK * 4)
+    begin = time.perf_counter()
+    await MyJson.awrite(file_name, data)
+    elapsed = time.perf_counter() - begin
+    stop.set()
+    await ticker
+    return elapsed, max(lags)
+
+# 写入大文件时事件循环保持响应
+def test_awrite_keeps_loop_responsive(tmp_path) -> None:
+    '''写入约 20 MiB 的 json 文件时，事件循环延迟应不超过 `LAG_BOUND`'''
+    file_name = str(tmp_path / 'large.json')
+    data = {str(index): {'name': '用户' * 5, 'list': list(range(20))} for index in range(50000)}
+    elapsed, max_lag = asyncio.run(_write_with_ticker(file_name, data))
+    
+    assert MyJson.read_to_dict(file_name, readonly=True)['49999']['name'] == '用户' * 5
+    assert max_lag < LAG_BOUND, f'写入 {elapsed:.3f} 秒，事件循环最大延迟 {max_lag:.3f} 秒'
@@ -0,0 +1,93 @@
+'''MyJson 跨进程文件锁压力测试。
+WindowsSov8 Anon Bot 自用 Adapter
+
+多个进程同时以 `MyJson.update` 对同一文件的计数器自增，并在每次自增后读取文件，
+启用跨进程文件锁时不应丢失任何一次自增，也不应读到写了一半的文件。
+
+运行::
+
+    python -m pytest tests/test_myjson_process_lock.py
+'''
+# -*- coding: utf-8 -*-
+# !/usr/bin/python3
+import json
+import time
+import multiprocessing
+from typing import Any
+
+import pytest
+
+from adapter.utils import MyJson, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason='当前系统不支持 fcntl 文件锁')
+
+# 进程数
+PROCESSES = 8
+
+# 每个进程的自增次数
+INCREMENTS = 200
+
+# 计数器自增
+def _increase(data: dict[str, Any]) -> None:
+    '''计数器自增'''
+    data['count'] = data.get('count', 0) + 1
+
+# 压力测试进程
+def _hammer(file_name: str, process_lock: bool, results: Any) -> None:
+    '''压力测试进程，自增计数器并在每次自增后读取，返回读到不完整内容的次数'''
+    MyJson.configure(process_lock=process_lock)
+    bad_reads = 0
+    for _ in range(INCREMENTS):
+        MyJson.update(file_name, _increase)
+        if not 'count' in MyJson.read_to_dict(file_name, readonly=True):
+            bad_reads += 1
+    results.put(bad_reads)
+
+# 持有排他锁一段时间
+def _hold(file_name: str, seconds: float, ready: Any) -> None:
+    '''持有排他锁一段时间，取得锁后设置 `ready`'''
+    MyJson.configure(process_lock=True)
+    with MyJson._process_lock(file_name, True):
+        ready.set()
+        time.sleep(seconds)
+
+# 多进程同时修改同一文件
+def test_update_from_processes(tmp_path) -> None:
+    '''多个进程同时修改同一文件，不应丢失修改或读到不完整的内容'''
+    file_name = str(tmp_path / 'counter.json')
+    MyJson.write(file_name, {'count': 0})
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [
+        context.Process(target=_hammer, args=(file_name, True, results)) for _ in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    bad_reads = sum(results.get(timeout=120) for _ in processes)
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+    
+    with open(file_name, 'r', encoding='utf-8') as file:
+        assert json.load(file)['count'] == PROCESSES * INCREMENTS
+    assert bad_reads == 0
+
+# 等待文件锁超时
+def test_lock_timeout(tmp_path) -> None:
+    '''其他进程持有排他锁时，写入应在 `lock_timeout` 后抛出 `TimeoutError`'''
+    file_name = str(tmp_path / 'locked.json')
+    MyJson.write(file_name, {})
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    holder = context.Process(target=_hold, args=(file_name, 2.0, ready))
+    holder.start()
+    try:
+        assert ready.wait(30)
+        MyJson.configure(process_lock=True, lock_timeout=0.2)
+        begin = time.monotonic()
+        with pytest.raises(TimeoutError):
+            MyJson.write(file_name, {'count': 1})
+        assert time.monotonic() - begin < 1.5
+    finally:
+        MyJson.configure(process_lock=False, lock_timeout=10.0)
+        holder.join()